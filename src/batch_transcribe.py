@@ -0,0 +1,168 @@
+"""
+batch_transcribe.py
+
+Offline batch transcription of the recordings archived in data/audio_raw.
+
+Features:
+- Uses faster-whisper's BatchedInferencePipeline (via SpeechToText.transcribe_batched)
+- Processes a directory with a bounded pool of worker threads
+- Skips files already transcribed, using the output JSONL as manifest
+  (a file is re-done only if its size or modification time changed)
+- Appends one JSON line per file, flushed immediately, so an interrupted run resumes
+- Optional --cache: transcripts keyed by audio content are reused across runs/outputs
+
+Run:
+    python src/batch_transcribe.py data/audio_raw -o data/transcripts.jsonl --language en
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
+
+from stt import SpeechToText
+from transcript_cache import TranscriptCache
+
+
+def file_key(path: Path) -> Dict:
+    """
+    Identity of a recording for the manifest: path, size and mtime.
+    """
+    st = path.stat()
+    return {"file": str(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_manifest(output: Path) -> Dict[str, Dict]:
+    """
+    Reads the results already written to the JSONL output.
+
+    Returns:
+        dict: file path -> its manifest record (only successful transcriptions).
+    """
+    done = {}
+    if not output.is_file():
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # truncated last line of an interrupted run
+            if "text" in record:
+                done[record["file"]] = record
+    return done
+
+
+def pending_files(input_dir: Path, pattern: str, manifest: Dict[str, Dict]) -> List[Path]:
+    """
+    Lists the recordings that are new or changed since they were transcribed.
+    """
+    pending = []
+    for path in sorted(input_dir.rglob(pattern)):
+        key = file_key(path)
+        record = manifest.get(key["file"])
+        if record and record.get("size") == key["size"] and record.get("mtime_ns") == key["mtime_ns"]:
+            continue
+        pending.append(path)
+    return pending
+
+
+def transcribe_file(stt: SpeechToText, path: Path, language, beam_size: int, batch_size: int) -> Dict:
+    """
+    Transcribes one file and returns its JSONL record.
+    """
+    t0 = time.perf_counter()
+    text, meta = stt.transcribe_batched(
+        str(path), language=language, beam_size=beam_size, batch_size=batch_size
+    )
+    record = file_key(path)
+    record.update({
+        "text": text,
+        "language": meta["language"],
+        "duration_s": round(meta["duration"], 3),
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "model": stt.model_size,
+    })
+    return record
+
+
+def run(args: argparse.Namespace):
+    input_dir = Path(args.input_dir)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    files = pending_files(input_dir, args.pattern, load_manifest(output))
+    if not files:
+        print(f"[Batch] Nothing to do: every file in {input_dir} is already transcribed.")
+        return
+    print(f"[Batch] {len(files)} file(s) to transcribe with {args.workers} worker(s)")
+
+    stt = SpeechToText(
+        model_size=args.model_size,
+        audio_dir=str(input_dir),
+        device=args.device,
+        compute_type=args.compute_type,
+        cpu_threads=args.cpu_threads,
+        num_workers=args.workers,   # lets the workers run the model concurrently
+        persist_audio=False,
+        cache=TranscriptCache(args.cache, max_bytes=args.cache_max_mb * 2**20) if args.cache else None,
+    )
+
+    start = time.perf_counter()
+    audio_s = 0.0
+    ok = failed = 0
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(transcribe_file, stt, path, args.language, args.beam_size, args.batch_size): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # not written to the manifest: the file is retried on the next run
+                failed += 1
+                print(f"[Batch] FAILED {path}: {e}")
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            ok += 1
+            audio_s += record["duration_s"]
+            print(f"[Batch] {ok + failed}/{len(files)} {path.name} ({record['elapsed_s']:.2f}s)")
+
+    elapsed = time.perf_counter() - start
+    speed = audio_s / elapsed if elapsed else 0.0
+    print(f"[Batch] Done: {ok} ok, {failed} failed, {audio_s:.0f}s of audio in {elapsed:.1f}s ({speed:.1f}x real time)")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch-transcribe archived recordings to JSONL.")
+    parser.add_argument("input_dir", nargs="?", default="data/audio_raw", help="Directory with recordings")
+    parser.add_argument("-o", "--output", default="data/transcripts.jsonl", help="JSONL results (also the manifest)")
+    parser.add_argument("--pattern", default="*.wav", help="Glob for the files to process (recursive)")
+    parser.add_argument("--language", default=None, help="ISO code; omit to auto-detect per file")
+    parser.add_argument("--model-size", default="small")
+    parser.add_argument("--device", default="auto", choices=["auto", "cuda", "cpu"])
+    parser.add_argument("--compute-type", default="auto")
+    parser.add_argument("--cpu-threads", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Files processed concurrently")
+    parser.add_argument("--batch-size", type=int, default=16, help="Speech chunks per model call")
+    parser.add_argument("--beam-size", type=int, default=1)
+    parser.add_argument("--cache", default=None,
+                        help="SQLite transcript cache, e.g. data/cache/transcripts.sqlite")
+    parser.add_argument("--cache-max-mb", type=int, default=64)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,297 @@
+"""
+benchmark.py
+
+Reproducible end-to-end latency benchmark of the voice coach pipeline.
+
+Each turn runs the same three stages as main.py, without a microphone or speakers:
+    SpeechToText.transcribe(fixture WAV) -> CoachEngine.reply -> TextToSpeech.speak
+
+Features:
+- Fixture WAVs replace the microphone; they are replayed in order, cycling until
+  --turns turns are done. By default a deterministic synthetic set is generated
+  (speech-like voiced bursts and pauses, fixed seed), so every machine and CI run
+  transcribes the same audio; pass a directory (e.g. data/audio_raw) to replay
+  real recordings instead
+- CoachEngine talks to a local FakeOllamaServer with configurable prefill/eval token
+  rates (or to a real Ollama with --ollama-host)
+- StubTextToSpeech synthesizes silence at a fixed real-time factor, so TTS cost is
+  deterministic (or --tts piper for the real voice, playback still skipped)
+- The transcript cache is disabled and every turn starts from an empty history, so
+  all turns do the same work
+- Prints p50/p95/p99/max per stage and for the whole turn; --json writes them to a file
+
+Run:
+    python src/benchmark.py --turns 50 --eval-tps 40 --json data/bench.json
+    python src/benchmark.py data/audio_raw --turns 50      # your own recordings
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+
+from coach import CoachEngine
+from fake_ollama import FakeOllamaServer
+from metrics import span
+
+if TYPE_CHECKING:
+    from stt import SpeechToText
+
+STAGES = ("transcribe", "llm", "tts", "turn")
+
+# Synthetic fixture set: clip lengths in seconds, generated with FIXTURE_SEED
+FIXTURE_DURATIONS = (2.0, 3.5, 5.0, 2.5, 4.0)
+FIXTURE_SEED = 1234
+
+
+class StubTextToSpeech:
+    """
+    Deterministic stand-in for TextToSpeech with the same speak/synthesize/play API.
+
+    The audio length is derived from the text (`chars_per_s` of speech) and synthesis
+    takes `rtf` times the audio length, roughly like Piper on a CPU; the returned PCM
+    is silence. Playback either sleeps for the audio duration ("realtime") or returns
+    immediately ("skip").
+    """
+
+    backend = "stub"
+
+    def __init__(self, sample_rate: int = 22050, chars_per_s: float = 15.0, rtf: float = 0.1, play: str = "skip"):
+        self.sample_rate = int(sample_rate)
+        self.chars_per_s = float(chars_per_s)
+        self.rtf = float(rtf)
+        self.realtime = play == "realtime"
+
+    def warmup(self):
+        self.synthesize("Hi.")
+
+    def speak(self, text: str):
+        if not text:
+            return
+        with span("tts.speak"):
+            self.play(self.synthesize(text))
+
+    def synthesize(self, text: str) -> np.ndarray:
+        with span("tts.synthesize", backend=self.backend):
+            audio_s = len(text) / self.chars_per_s
+            time.sleep(audio_s * self.rtf)
+            return np.zeros(int(audio_s * self.sample_rate), dtype=np.int16)
+
+    def play(self, audio: np.ndarray):
+        with span("tts.play", backend=self.backend):
+            if self.realtime:
+                time.sleep(len(audio) / self.sample_rate)
+
+    def interrupt(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def write_fixtures(directory: Path, sample_rate: int = 16000, seed: int = FIXTURE_SEED) -> List[Path]:
+    """
+    Write the synthetic fixture set: one mono 16-bit WAV per FIXTURE_DURATIONS entry.
+
+    Each clip alternates voiced bursts (a harmonic series at a drifting pitch,
+    shaped like syllables) with short pauses over a low noise floor. The audio
+    only has to cost the recognizer a realistic amount of work; an empty
+    transcript is replaced by a fixed prompt in run_turn. Same seed, same bytes.
+
+    Returns:
+        list: The written paths, in replay order.
+    """
+    rng = np.random.default_rng(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, duration in enumerate(FIXTURE_DURATIONS):
+        n = int(duration * sample_rate)
+        t = np.arange(n) / sample_rate
+        pitch = rng.uniform(110, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.3, 1.0) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        syllables = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t), 0, None)
+        # pauses of ~0.4 s between bursts of words
+        words = (np.sin(2 * np.pi * 0.6 * t + rng.uniform(0, np.pi)) > -0.5).astype(np.float64)
+        signal = 0.3 * voiced * syllables * words + 0.005 * rng.standard_normal(n)
+        path = directory / f"synthetic_{i:02d}.wav"
+        with wave.open(str(path), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes((np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes())
+        paths.append(path)
+    return paths
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    q-th percentile (0-100) with linear interpolation between the closest ranks.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """
+    Per-stage count, mean, p50, p95, p99 and max, in seconds.
+    """
+    summary = {}
+    for stage, values in samples.items():
+        summary[stage] = {
+            "count": len(values),
+            "mean": sum(values) / len(values) if values else float("nan"),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else float("nan"),
+        }
+    return summary
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    lines = [f"{'stage':<12}{'n':>5}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"]
+    for stage, s in summary.items():
+        cells = "".join(f"{s[k] * 1000:>8.0f}ms" for k in ("mean", "p50", "p95", "p99", "max"))
+        lines.append(f"{stage:<12}{s['count']:>5}{cells}")
+    return "\n".join(lines)
+
+
+def run_turn(stt: SpeechToText, coach, tts, wav_path: Path, language: Optional[str]) -> Dict[str, float]:
+    """
+    One measured turn on a fixture recording.
+
+    Returns:
+        dict: stage -> seconds, plus the LLM token counts.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    t0 = time.perf_counter()
+    text = stt.transcribe(str(wav_path), language=language) or "Hello."
+    timings["transcribe"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reply = coach.reply(text, history=coach.new_history())
+    timings["llm"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    tts.speak(reply)
+    timings["tts"] = time.perf_counter() - t0
+
+    timings["turn"] = time.perf_counter() - start
+    timings["prompt_tokens"] = coach.last_timings.get("prompt_tokens", 0)
+    timings["eval_tokens"] = coach.last_timings.get("eval_tokens", 0)
+    return timings
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    if args.fixtures:
+        return _run(args, sorted(Path(args.fixtures).rglob(args.pattern)))
+    with tempfile.TemporaryDirectory(prefix="coach-bench-") as tmp:
+        print(f"[Bench] synthetic fixtures (seed {FIXTURE_SEED}) in {tmp}")
+        return _run(args, write_fixtures(Path(tmp)))
+
+
+def _run(args: argparse.Namespace, fixtures: List[Path]) -> Dict[str, Dict[str, float]]:
+    # the STT/TTS stack is only imported for a real run: the helpers above and
+    # StubTextToSpeech stay usable without it (tests/test_benchmark.py)
+    from components import build_stt, build_tts, load_config, warm_up
+
+    if not fixtures:
+        raise SystemExit(f"[Bench] No fixture recordings matching {args.pattern} in {args.fixtures}")
+
+    cfg = load_config(args.config)
+    cfg["stt"] = dict(cfg.get("stt") or {}, cache_path=None)  # every turn must really transcribe
+    if args.model_size:
+        cfg["stt"]["model_size"] = args.model_size
+
+    fake = None
+    if args.ollama_host:
+        cfg["coach"]["host"] = args.ollama_host
+    else:
+        fake = FakeOllamaServer(
+            eval_tokens_per_s=args.eval_tps,
+            prefill_tokens_per_s=args.prefill_tps,
+            load_s=args.load_s,
+        ).start()
+        cfg["coach"]["host"] = fake.url
+        print(f"[Bench] fake Ollama at {fake.url} ({args.eval_tps:g} tok/s eval, {args.prefill_tps:g} tok/s prefill)")
+
+    try:
+        coach = CoachEngine(cfg)
+        stt = build_stt(cfg)
+        if args.tts == "piper":
+            tts = build_tts(cfg)
+            tts.play = lambda audio: None  # synthesis only: no speakers in a benchmark
+        else:
+            tts = StubTextToSpeech(chars_per_s=args.chars_per_s, rtf=args.tts_rtf, play=args.play)
+        warm_up(stt=stt, coach=coach, tts=tts)
+
+        samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        total = args.warmup_turns + args.turns
+        for i in range(total):
+            wav_path = fixtures[i % len(fixtures)]
+            timings = run_turn(stt, coach, tts, wav_path, args.language)
+            if i < args.warmup_turns:
+                continue
+            for stage in STAGES:
+                samples[stage].append(timings[stage])
+            print(f"[Bench] {i - args.warmup_turns + 1}/{args.turns} {wav_path.name}: "
+                  + " ".join(f"{stage} {timings[stage] * 1000:.0f}ms" for stage in STAGES))
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    summary = summarize(samples)
+    print("\n" + format_summary(summary))
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "stages": summary}, f, indent=2)
+        print(f"[Bench] results written to {args.json}")
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark on fixture recordings.")
+    parser.add_argument("fixtures", nargs="?", default=None,
+                        help="Directory with fixture WAVs (default: generated synthetic set)")
+    parser.add_argument("--pattern", default="*.wav", help="Glob for the fixtures (recursive)")
+    parser.add_argument("--config", default="config/settings.yaml")
+    parser.add_argument("--turns", type=int, default=20, help="Measured turns")
+    parser.add_argument("--warmup-turns", type=int, default=1, help="Turns run first and not measured")
+    parser.add_argument("--language", default="en", help="ISO code; empty to auto-detect")
+    parser.add_argument("--model-size", default=None, help="Override stt.model_size")
+    parser.add_argument("--ollama-host", default=None, help="Benchmark a real Ollama instead of the fake server")
+    parser.add_argument("--eval-tps", type=float, default=40.0, help="Fake server generation speed")
+    parser.add_argument("--prefill-tps", type=float, default=800.0, help="Fake server prompt speed")
+    parser.add_argument("--load-s", type=float, default=0.0, help="Fake server first-request delay")
+    parser.add_argument("--tts", default="stub", choices=["stub", "piper"])
+    parser.add_argument("--tts-rtf", type=float, default=0.1, help="Stub synthesis time / audio time")
+    parser.add_argument("--chars-per-s", type=float, default=15.0, help="Stub speaking rate")
+    parser.add_argument("--play", default="skip", choices=["skip", "realtime"],
+                        help="Stub playback: return at once or sleep for the audio duration")
+    parser.add_argument("--json", default=None, help="Write the summary to this JSON file")
+    args = parser.parse_args(argv)
+    args.language = args.language or None
+    return args
+
+
+if __name__ == "__main__":
+    run(parse_args())
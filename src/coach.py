@@ -6,9 +6,103 @@ with the local Llama 3.1 8B Instruct model via Ollama to perform self-coaching.
 
 The class applies a predefined "system prompt" so that every answer from the model
 is generated in a life-coaching style: empathetic, concise, and oriented to action.
+
+The ConversationHistory class keeps the previous turns of the session, bounded by
+a token budget, so the coach remembers context without the prompt growing forever.
 """
 
-from ollama import Client
+import asyncio
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+from ollama import AsyncClient, Client
+
+from metrics import inc, observe, span
+
+
+class ConversationHistory:
+    """
+    Stores the user/assistant turns of a coaching session within a token budget.
+
+    When the budget is exceeded the oldest turns are dropped (in user/assistant
+    pairs). Dropped turns can optionally be condensed into a running summary,
+    which CoachEngine sends right after the system prompt.
+
+    Token counts are estimated (~4 characters per token), which is accurate
+    enough to bound the prompt size without loading a tokenizer.
+
+    Trimming goes down to `trim_ratio * max_tokens` in one step rather than
+    dropping a single turn per request: between trims the message prefix stays
+    byte-identical, so Ollama can reuse its KV cache and only prefill the new turn.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, max_tokens: int = 2048, trim_ratio: float = 0.5):
+        """
+        Args:
+            max_tokens (int): Budget for the stored turns plus the summary.
+            trim_ratio (float): Fraction of the budget kept after a trim (0 < ratio <= 1).
+        """
+        self.max_tokens = int(max_tokens)
+        self.trim_ratio = float(trim_ratio)
+        self.turns: List[dict] = []
+        self.summary = ""
+
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        """
+        Rough token count of a piece of text.
+        """
+        return (len(text) + cls.CHARS_PER_TOKEN - 1) // cls.CHARS_PER_TOKEN
+
+    def total_tokens(self) -> int:
+        """
+        Estimated tokens of the summary plus all stored turns.
+        """
+        return self.estimate_tokens(self.summary) + sum(
+            self.estimate_tokens(m["content"]) for m in self.turns
+        )
+
+    def add(self, user_text: str, assistant_text: str):
+        """
+        Append a completed turn.
+        """
+        self.turns.append({"role": "user", "content": user_text})
+        self.turns.append({"role": "assistant", "content": assistant_text})
+
+    def trim(self) -> List[dict]:
+        """
+        Once the history exceeds the budget, drop the oldest turns until it fits
+        `trim_ratio * max_tokens`. The most recent turn is always kept.
+
+        Returns:
+            list: The dropped messages (oldest first).
+        """
+        dropped = []
+        if self.total_tokens() <= self.max_tokens:
+            return dropped
+        target = int(self.max_tokens * self.trim_ratio)
+        while len(self.turns) > 2 and self.total_tokens() > target:
+            dropped.extend(self.turns[:2])
+            del self.turns[:2]
+        return dropped
+
+    def messages(self) -> List[dict]:
+        """
+        Messages to send between the system prompt and the new user turn.
+        """
+        prefix = []
+        if self.summary:
+            prefix.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return prefix + list(self.turns)
+
+    def clear(self):
+        """
+        Forget the whole session.
+        """
+        self.turns.clear()
+        self.summary = ""
 
 
 class CoachEngine:
@@ -16,11 +110,13 @@ class CoachEngine:
     The CoachEngine is responsible for:
     - Initializing the Ollama client
     - Defining the system prompt that guides the AI to act as a life coach
+    - Keeping a bounded memory of the conversation
     - Sending user input to the model and returning the AI's response
 
     This class is OOP to encapsulate:
     - Model configuration
     - System prompt management
+    - Conversation memory
     - The method that sends/receives data from the AI
     """
 
@@ -32,36 +128,297 @@ class CoachEngine:
             cfg (dict): Configuration dictionary, should contain:
                         - coach.model_name: name of the Llama model in Ollama
                         - coach.system_prompt: custom instructions for the AI
+                        Optional:
+                        - coach.history_max_tokens: token budget for past turns (default 2048)
+                        - coach.history_trim_ratio: fraction of the budget kept after a trim (default 0.5)
+                        - coach.summarize_history: condense dropped turns into a summary
+                          instead of forgetting them (default False)
+                        - coach.keep_alive: how long Ollama keeps the model loaded after a
+                          request, e.g. "30m"; -1 pins it in memory (default "30m")
+                        - coach.options: Ollama model options (num_ctx, temperature, ...).
+                          Sent identically on every call, so they never force a model reload.
+                        - coach.host: Ollama server URL (default: OLLAMA_HOST or the local server)
         """
         self.cfg = cfg
         self.model = cfg["coach"]["model_name"]
         self.system_prompt = cfg["coach"]["system_prompt"]
-        # Create Ollama client instance (connects to local Ollama server)
-        self.client = Client()
+        self.history_max_tokens = int(cfg["coach"].get("history_max_tokens", 2048))
+        self.history_trim_ratio = float(cfg["coach"].get("history_trim_ratio", 0.5))
+        self.summarize_history = bool(cfg["coach"].get("summarize_history", False))
+        self.keep_alive = cfg["coach"].get("keep_alive", "30m")
+        self.options = cfg["coach"].get("options") or None
+        self.history = self.new_history()
+        # Last background summary update started by reply_astream (see _aremember)
+        self._summary_task: Optional[asyncio.Task] = None
+        # Prefill/eval timings of the last completed request (see _record_timings)
+        self.last_timings: dict = {}
+        # Create Ollama client instances (connect to local Ollama server)
+        host = cfg["coach"].get("host")
+        self.client = Client(host=host)
+        self.async_client = AsyncClient(host=host)
+
+    def new_history(self) -> ConversationHistory:
+        """
+        Create an empty conversation history with the configured budget.
+        """
+        return ConversationHistory(max_tokens=self.history_max_tokens, trim_ratio=self.history_trim_ratio)
+
+    def _chat(self, messages: list, stream: bool = False):
+        """
+        Call Ollama's chat API with the engine-wide model settings.
+
+        keep_alive and options are passed identically on every call: a change
+        in either makes Ollama reload the model and drop its prompt cache.
+        """
+        return self.client.chat(
+            model=self.model,
+            messages=messages,
+            stream=stream,
+            options=self.options,
+            keep_alive=self.keep_alive,
+        )
+
+    async def _achat(self, messages: list, stream: bool = False):
+        """
+        Async counterpart of _chat, using Ollama's AsyncClient.
+        """
+        return await self.async_client.chat(
+            model=self.model,
+            messages=messages,
+            stream=stream,
+            options=self.options,
+            keep_alive=self.keep_alive,
+        )
+
+    def _record_timings(self, response) -> dict:
+        """
+        Store Ollama's timing counters from a final response in self.last_timings.
+
+        prompt_tokens counts only the tokens that had to be prefilled: when the
+        message prefix hits Ollama's prompt cache it is much smaller than the
+        whole prompt, and prefill_ms drops accordingly.
+
+        Returns:
+            dict: prompt_tokens, prefill_ms, eval_tokens, eval_ms, load_ms,
+                  total_ms and eval_tokens_per_s.
+        """
+        def ms(name):
+            return (getattr(response, name, None) or 0) / 1e6
+
+        eval_tokens = getattr(response, "eval_count", None) or 0
+        eval_ms = ms("eval_duration")
+        self.last_timings = {
+            "prompt_tokens": getattr(response, "prompt_eval_count", None) or 0,
+            "prefill_ms": ms("prompt_eval_duration"),
+            "eval_tokens": eval_tokens,
+            "eval_ms": eval_ms,
+            "load_ms": ms("load_duration"),
+            "total_ms": ms("total_duration"),
+            "eval_tokens_per_s": eval_tokens / (eval_ms / 1000) if eval_ms else 0.0,
+        }
+        inc("coach.prompt_tokens", self.last_timings["prompt_tokens"])
+        inc("coach.eval_tokens", eval_tokens)
+        observe("coach.prefill", self.last_timings["prefill_ms"] / 1000)
+        return self.last_timings
+
+    def warmup(self):
+        """
+        Load the model in Ollama and prefill the system prompt with a one-token generation,
+        so the first real turn does not pay for model load and system-prompt prefill.
+        """
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": "Hi"},
+        ]
+        self.client.chat(
+            model=self.model,
+            messages=messages,
+            options={**(self.options or {}), "num_predict": 1},
+            keep_alive=self.keep_alive,
+        )
+
+    def _build_messages(self, user_text: str, history: ConversationHistory) -> list:
+        """
+        Compose the conversation structure for Ollama's API.
+
+        Args:
+            user_text (str): The message from the user (coachee).
+            history (ConversationHistory): Previous turns of the session.
+
+        Returns:
+            list: Chat messages (system prompt, previous turns, new user turn).
+        """
+        return (
+            [{"role": "system", "content": self.system_prompt}]
+            + history.messages()
+            + [{"role": "user", "content": user_text}]
+        )
+
+    def _remember(self, history: ConversationHistory, user_text: str, ai_reply: str):
+        """
+        Store a completed turn and keep the history within its token budget.
+        """
+        history.add(user_text, ai_reply)
+        dropped = history.trim()
+        if dropped and self.summarize_history:
+            history.summary = self._summarize(history.summary, dropped)
+
+    def _summarize(self, summary: str, dropped: list) -> str:
+        """
+        Fold dropped turns into the running summary of the session.
+
+        Args:
+            summary (str): The current summary (may be empty).
+            dropped (list): Messages removed from the history.
+
+        Returns:
+            str: The updated summary.
+        """
+        response = self._chat(self._summary_messages(summary, dropped))
+        return response["message"]["content"].strip()
+
+    @staticmethod
+    def _summary_messages(summary: str, dropped: list) -> list:
+        """
+        Chat request asking the model to fold dropped turns into the summary.
+        """
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
+        prompt = (
+            "Update the summary of a life-coaching conversation. Keep the user's goals, "
+            "feelings, identified thoughts and agreed micro-actions. Max 80 words.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+        )
+        return [{"role": "user", "content": prompt}]
+
+    def _aremember(self, history: ConversationHistory, user_text: str, ai_reply: str):
+        """
+        _remember for the asyncio path: never blocks the event loop.
 
-    def reply(self, user_text: str) -> str:
+        The turn is stored and trimmed at once; the summary of the dropped turns is
+        folded in by a background task through the AsyncClient, so neither the end
+        of the reply nor a barge-in waits for the extra Ollama call. Summary tasks
+        run one after another, each starting from the previous summary.
+        """
+        history.add(user_text, ai_reply)
+        dropped = history.trim()
+        if dropped and self.summarize_history:
+            self._summary_task = asyncio.create_task(
+                self._afold_summary(history, dropped, self._summary_task)
+            )
+
+    async def _afold_summary(self, history: ConversationHistory, dropped: list, previous: Optional[asyncio.Task]):
+        """
+        Background task of _aremember: waits for the previous update, then asks the model.
+        """
+        if previous is not None:
+            await asyncio.wait({previous})
+        try:
+            response = await self._achat(self._summary_messages(history.summary, dropped))
+            history.summary = response["message"]["content"].strip()
+        except Exception as e:
+            print(f"[Coach] Summary update failed: {e}")
+
+    def reply(self, user_text: str, history: Optional[ConversationHistory] = None) -> str:
         """
         Send user input to the AI model and return the generated reply.
 
         Args:
             user_text (str): The message from the user (coachee).
+            history (ConversationHistory): Session memory to use; defaults to self.history.
 
         Returns:
             str: The AI's reply in life-coaching style.
         """
-        # Compose the conversation structure for Ollama's API
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": user_text}
-        ]
+        history = self.history if history is None else history
+        messages = self._build_messages(user_text, history)
 
         # Send the request to the local model via Ollama's chat API
-        response = self.client.chat(model=self.model, messages=messages)
+        with span("coach.reply", mode="blocking"):
+            response = self._chat(messages)
+        self._record_timings(response)
+
+        # Extract the AI's generated message; the history keeps it verbatim so the
+        # next prompt re-renders exactly what the model produced (prompt cache hit)
+        content = response["message"]["content"]
+        self._remember(history, user_text, content)
+
+        return content.strip()
+
+    def reply_stream(self, user_text: str, history: Optional[ConversationHistory] = None) -> Iterator[str]:
+        """
+        Send user input to the AI model and yield the reply while it is generated.
+
+        Uses Ollama's stream mode, so the first words are available as soon as
+        the model produces them instead of after the whole answer is done.
+        The turn is added to the history once the stream is exhausted; if the
+        consumer stops early (e.g. the user interrupts), the partial reply is kept.
+
+        Args:
+            user_text (str): The message from the user (coachee).
+            history (ConversationHistory): Session memory to use; defaults to self.history.
+
+        Yields:
+            str: Content deltas of the AI's reply, in generation order.
+        """
+        history = self.history if history is None else history
+        messages = self._build_messages(user_text, history)
+
+        parts = []
+        start = time.perf_counter()
+        try:
+            with span("coach.reply", mode="stream"):
+                for chunk in self._chat(messages, stream=True):
+                    delta = chunk["message"]["content"]
+                    if delta:
+                        if not parts:
+                            observe("coach.first_token", time.perf_counter() - start, mode="stream")
+                        parts.append(delta)
+                        yield delta
+                    if chunk.done:
+                        self._record_timings(chunk)
+        except GeneratorExit:
+            # closed by the consumer: remember what the user actually heard
+            self._remember(history, user_text, "".join(parts))
+            raise
+
+        self._remember(history, user_text, "".join(parts))
+
+    async def reply_astream(
+        self, user_text: str, history: Optional[ConversationHistory] = None
+    ) -> AsyncIterator[str]:
+        """
+        Async version of reply_stream for asyncio pipelines (Ollama AsyncClient).
+        Cancelling the consuming task closes the HTTP stream, so Ollama stops
+        generating; the partial reply is kept in the history.
+
+        Args:
+            user_text (str): The message from the user (coachee).
+            history (ConversationHistory): Session memory to use; defaults to self.history.
+
+        Yields:
+            str: Content deltas of the AI's reply, in generation order.
+        """
+        history = self.history if history is None else history
+        messages = self._build_messages(user_text, history)
 
-        # Extract the AI's generated message
-        ai_reply = response["message"]["content"].strip()
+        parts = []
+        start = time.perf_counter()
+        try:
+            with span("coach.reply", mode="async"):
+                async for chunk in await self._achat(messages, stream=True):
+                    delta = chunk["message"]["content"]
+                    if delta:
+                        if not parts:
+                            observe("coach.first_token", time.perf_counter() - start, mode="async")
+                        parts.append(delta)
+                        yield delta
+                    if chunk.done:
+                        self._record_timings(chunk)
+        except (asyncio.CancelledError, GeneratorExit):
+            self._aremember(history, user_text, "".join(parts))
+            raise
 
-        return ai_reply
+        self._aremember(history, user_text, "".join(parts))
 
 
 # Example of a default system prompt for life coaching
@@ -0,0 +1,146 @@
+"""
+components.py
+
+Builds the engines shared by every front end of the Coach AI project: the
+console conversation (main.py / orchestrator.py), the multi-session HTTP server
+(server.py) and the latency benchmark (benchmark.py).
+
+Features:
+- Loads configuration from YAML
+- Creates CoachEngine, SpeechToText and TextToSpeech from it, concurrently
+- Warms every engine up so the first real turn hits steady-state latency
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+from tts import TextToSpeech
+from phrase_cache import PhraseCache
+from coach import CoachEngine, DEFAULT_SYSTEM_PROMPT
+from stt import SpeechToText
+from transcript_cache import TranscriptCache
+
+
+def load_config(path: str = "config/settings.yaml") -> dict:
+    """
+    Load configuration from a YAML file.
+    The coach section is guaranteed to exist, with the default system prompt
+    if none is configured.
+
+    Args:
+        path (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: Configuration data.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+
+    # Ensure coach section exists
+    if "coach" not in cfg:
+        cfg["coach"] = {}
+    cfg["coach"].setdefault("system_prompt", DEFAULT_SYSTEM_PROMPT)
+    return cfg
+
+
+def build_stt(cfg: dict) -> SpeechToText:
+    """
+    Create the offline STT engine (loads the Whisper model).
+    """
+    stt_cfg = cfg.get("stt") or {}
+    cache = None
+    if stt_cfg.get("cache_path"):
+        cache = TranscriptCache(stt_cfg["cache_path"], max_bytes=int(stt_cfg.get("cache_max_mb", 64)) * 2**20)
+    return SpeechToText(
+        model_size=stt_cfg.get("model_size", "small"),   # "base" for better accuracy, "tiny" for speed
+        sample_rate=16000,
+        audio_dir="data/audio_raw",
+        device=stt_cfg.get("device", "auto"),             # cuda if available, else cpu
+        compute_type=stt_cfg.get("compute_type", "auto"), # float16 on GPU, int8 on CPU
+        cpu_threads=stt_cfg.get("cpu_threads", 0),
+        num_workers=stt_cfg.get("num_workers", 1),
+        cache=cache,
+    )
+
+
+def build_tts(cfg: dict) -> TextToSpeech:
+    """
+    Create the offline TTS engine (loads the Piper voice).
+    """
+    tts_cfg = cfg.get("tts") or {}
+    cache = None
+    if tts_cfg.get("cache", True):
+        cache = PhraseCache(
+            max_bytes=int(tts_cfg.get("cache_max_mb", 32)) * 2**20,
+            persist_dir=tts_cfg.get("cache_dir"),
+        )
+    return TextToSpeech(
+        piper_dir="models/piper",
+        model_name="en_US-amy-medium",
+        model_path=tts_cfg.get("model_path"),
+        config_path=tts_cfg.get("config_path"),
+        use_cuda=tts_cfg.get("use_cuda", False),
+        backend=tts_cfg.get("backend", "auto"),  # "onnx" = in-process, "exe" = piper.exe
+        in_memory=tts_cfg.get("in_memory", True),  # play NumPy PCM via sounddevice, no temp files
+        cache=cache,                               # repeated sentences skip synthesis
+        workers=tts_cfg.get("workers", 1),         # >1: parallel synthesis for concurrent sessions
+    )
+
+
+def load_components(cfg: dict):
+    """
+    Construct CoachEngine, SpeechToText and TextToSpeech concurrently.
+    They are independent, so startup takes as long as the slowest one
+    instead of the sum of the three. Load times are printed per component.
+
+    Args:
+        cfg (dict): Configuration data.
+
+    Returns:
+        tuple: (coach, stt, tts)
+    """
+    builders = {
+        "coach": lambda: CoachEngine(cfg),
+        "stt": lambda: build_stt(cfg),
+        "tts": lambda: build_tts(cfg),
+    }
+    start = time.perf_counter()
+
+    def run(name, build):
+        t0 = time.perf_counter()
+        component = build()
+        print(f"[Startup] {name} loaded in {time.perf_counter() - t0:.2f}s")
+        return component
+
+    with ThreadPoolExecutor(max_workers=len(builders)) as pool:
+        futures = {name: pool.submit(run, name, build) for name, build in builders.items()}
+        # result() re-raises any loading error in the main thread
+        components = {name: future.result() for name, future in futures.items()}
+    print(f"[Startup] all components loaded in {time.perf_counter() - start:.2f}s")
+    return components["coach"], components["stt"], components["tts"]
+
+
+def warm_up(**engines):
+    """
+    Run the warm-up of every engine concurrently (dummy clip, one-token generation,
+    one-word synthesis), so the first real turn hits steady-state latency.
+
+    Args:
+        **engines: name -> object exposing warmup().
+    """
+    start = time.perf_counter()
+
+    def run(name, engine):
+        t0 = time.perf_counter()
+        try:
+            engine.warmup()
+            print(f"[Warm-up] {name} ready in {time.perf_counter() - t0:.2f}s")
+        except Exception as e:
+            print(f"[Warm-up] {name} failed: {e}")
+
+    with ThreadPoolExecutor(max_workers=len(engines)) as pool:
+        for name, engine in engines.items():
+            pool.submit(run, name, engine)
+    print(f"[Warm-up] done in {time.perf_counter() - start:.2f}s")
+
@@ -0,0 +1,229 @@
+"""
+fake_ollama.py
+
+A local stand-in for the Ollama HTTP API, used to benchmark the pipeline
+without a GPU or a real model.
+
+Features:
+- Serves POST /api/chat (streaming NDJSON or a single JSON response), the only
+  endpoint CoachEngine uses, plus GET /api/version for health checks
+- Deterministic timing: prefill at `prefill_tokens_per_s` (prompt size estimated
+  like ConversationHistory, ~4 characters per token) and generation at
+  `eval_tokens_per_s`, with an optional one-off load delay
+- Reports prompt_eval_count/eval_count and the *_duration fields exactly like
+  Ollama, so CoachEngine.last_timings works unchanged
+- Honours options.num_predict (CoachEngine.warmup asks for a single token)
+
+Run standalone (then set coach.host to http://127.0.0.1:11500):
+    python src/fake_ollama.py --port 11500 --eval-tps 40 --prefill-tps 800
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from coach import ConversationHistory
+
+DEFAULT_REPLY = (
+    "That sounds like a lot to carry at once. What feels most urgent to you right now? "
+    "As a first step, write down the one task that would make tomorrow feel lighter, "
+    "and give yourself ten minutes to start it before lunch."
+)
+
+
+def _tokens(text: str) -> List[str]:
+    """
+    Split a reply into pseudo-tokens (words with their leading space, punctuation),
+    which concatenate back to the original text.
+    """
+    return re.findall(r"\s*\w+|\s*[^\w\s]", text)
+
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server answering every chat request with the same canned reply
+    at a configurable token rate. Each request is served on its own thread, so
+    concurrent sessions overlap like they would against a real server with
+    OLLAMA_NUM_PARALLEL > 1.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        reply: str = DEFAULT_REPLY,
+        eval_tokens_per_s: float = 40.0,
+        prefill_tokens_per_s: float = 800.0,
+        load_s: float = 0.0,
+    ):
+        """
+        Args:
+            host: Interface to bind.
+            port: TCP port; 0 picks a free one (see self.url).
+            reply: Text streamed back for every request.
+            eval_tokens_per_s: Generation speed; 0 = no delay.
+            prefill_tokens_per_s: Prompt processing speed; 0 = no delay.
+            load_s: Delay added to the first request only (model load).
+        """
+        self.reply_tokens = _tokens(reply)
+        self.eval_tokens_per_s = float(eval_tokens_per_s)
+        self.prefill_tokens_per_s = float(prefill_tokens_per_s)
+        self.load_s = float(load_s)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _load_delay(self) -> float:
+        """
+        The load delay is paid once, by whichever request arrives first.
+        """
+        with self._lock:
+            self.requests += 1
+            return self.load_s if self.requests == 1 else 0.0
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server.chat(self, request)
+
+            def _send_json(self, body: dict, status: int = 200):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass  # keep benchmark output clean
+
+        return Handler
+
+    def chat(self, handler: BaseHTTPRequestHandler, request: dict):
+        """
+        Answer one /api/chat request, sleeping to simulate load, prefill and eval.
+        """
+        start = time.perf_counter()
+        model = request.get("model", "fake")
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        prompt_tokens = ConversationHistory.estimate_tokens(prompt)
+        num_predict = (request.get("options") or {}).get("num_predict")
+        tokens = self.reply_tokens[:num_predict] if num_predict and num_predict > 0 else self.reply_tokens
+        stream = request.get("stream", True)
+
+        load_s = self._load_delay()
+        prefill_s = prompt_tokens / self.prefill_tokens_per_s if self.prefill_tokens_per_s else 0.0
+        token_s = 1.0 / self.eval_tokens_per_s if self.eval_tokens_per_s else 0.0
+        time.sleep(load_s + prefill_s)
+
+        def message(content: str, done: bool) -> dict:
+            body = {
+                "model": model,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+            }
+            if done:
+                body.update({
+                    "done_reason": "stop",
+                    "total_duration": int((time.perf_counter() - start) * 1e9),
+                    "load_duration": int(load_s * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prefill_s * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int(len(tokens) * token_s * 1e9),
+                })
+            return body
+
+        if not stream:
+            time.sleep(len(tokens) * token_s)
+            handler._send_json(message("".join(tokens), done=True))
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write_chunk(body: dict):
+            data = json.dumps(body).encode("utf-8") + b"\n"
+            handler.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            handler.wfile.flush()
+
+        try:
+            for token in tokens:
+                time.sleep(token_s)
+                write_chunk(message(token, done=False))
+            write_chunk(message("", done=True))
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream (e.g. barge-in)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama chat API with a fixed token rate.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--eval-tps", type=float, default=40.0, help="Generated tokens per second")
+    parser.add_argument("--prefill-tps", type=float, default=800.0, help="Prompt tokens processed per second")
+    parser.add_argument("--load-s", type=float, default=0.0, help="Extra delay of the first request")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="Text returned for every request")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    fake = FakeOllamaServer(
+        host=args.host, port=args.port, reply=args.reply,
+        eval_tokens_per_s=args.eval_tps, prefill_tokens_per_s=args.prefill_tps, load_s=args.load_s,
+    )
+    print(f"[FakeOllama] listening on {fake.url} (Ctrl+C to stop)")
+    try:
+        fake._httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,76 @@
+"""
+latency.py
+
+Per-turn latency breakdown for the Coach AI conversation loop.
+
+Every turn gets a TurnReport; the stages fill it in as they run and the loop
+prints one line at the end of the turn, e.g.:
+
+    [Latency] record 2.41s | transcribe 0.12s | LLM first token 0.31s | LLM total 3.02s |
+              synthesize 0.84s | play 7.90s | first audio 0.93s | turn 11.2s
+
+Synthesis and playback run once per sentence, so their values are summed.
+"first audio" is measured from the start of the reply (end of user input).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+# (key, label) in report order
+STAGES = (
+    ("record", "record"),
+    ("transcribe", "transcribe"),
+    ("llm_first_token", "LLM first token"),
+    ("llm_total", "LLM total"),
+    ("synthesize", "synthesize"),
+    ("play", "play"),
+    ("first_audio", "first audio"),
+)
+
+
+class TurnReport:
+    """
+    Collects stage durations (seconds) for one conversation turn.
+    Thread-safe: the synthesis/playback workers add to it concurrently.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.reply_started: Optional[float] = None
+        self.values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def begin_reply(self):
+        """
+        Mark the end of user input: LLM first token and first audio are relative to it.
+        """
+        self.reply_started = time.perf_counter()
+
+    def since_reply(self) -> float:
+        """
+        Seconds since begin_reply() (or since the turn started).
+        """
+        return time.perf_counter() - (self.reply_started or self.started)
+
+    def set(self, stage: str, seconds: float):
+        with self._lock:
+            self.values[stage] = seconds
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.values[stage] = self.values.get(stage, 0.0) + seconds
+
+    def mark_once(self, stage: str):
+        """
+        Record the time since begin_reply() the first time `stage` happens.
+        """
+        with self._lock:
+            self.values.setdefault(stage, self.since_reply())
+
+    def format(self) -> str:
+        parts = [f"{label} {self.values[key]:.2f}s" for key, label in STAGES if key in self.values]
+        parts.append(f"turn {time.perf_counter() - self.started:.1f}s")
+        return "[Latency] " + " | ".join(parts)
@@ -0,0 +1,321 @@
+"""
+metrics.py
+
+Lightweight latency instrumentation for the Coach AI project.
+
+This module provides:
+- Spans: context managers timing a block with a monotonic clock
+  (time.perf_counter); each span feeds a histogram and a counter
+- Counters, gauges and histograms with optional labels
+- Exporters: JSON lines (one event per finished span), Prometheus text
+  format (file or a local HTTP /metrics endpoint)
+
+Usage:
+    from metrics import span, inc
+
+    with span("stt.transcribe", mode="array"):
+        ...
+    inc("tts.cache_hits")
+
+    REGISTRY.open_jsonl("data/metrics/spans.jsonl")
+    REGISTRY.serve(port=9464)           # http://127.0.0.1:9464/metrics
+
+Metric names use dots in code ("coach.reply"); the Prometheus exporter turns
+them into underscores ("coach_reply_seconds", "coach_reply_total").
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Default histogram buckets (seconds): from a few ms (cache hits) to a minute (long replies)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _prom_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prom_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{_prom_name(k)}="{_prom_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus semantics).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Approximate quantile (upper bound of the bucket containing it).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for upper, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= rank:
+                return upper
+        return math.inf
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of counters, gauges and histograms, plus the span context manager.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._jsonl = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ---------------------------
+    # Recording
+    # ---------------------------
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """
+        Increase a counter.
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """
+        Set a gauge (a value that goes up and down, e.g. a queue depth).
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            self.gauges[key] = float(value)
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record a value (seconds for latencies) in a histogram.
+        """
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[dict]:
+        """
+        Time a block. On exit, observes `<name>` (seconds), increments
+        `<name>` calls by status and writes a JSON-lines event. The status is
+        "cancelled" for GeneratorExit/CancelledError (a stream closed by barge-in
+        or a client disconnect is not a failure), "error" for other exceptions.
+
+        Yields a dict: keys added to it inside the block are included in the
+        JSON-lines event (e.g. token counts).
+        """
+        attrs: dict = {}
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(name, duration, **labels)
+            self.inc(f"{name}.calls", status=status, **labels)
+            self._emit({
+                "ts": time.time(),
+                "span": name,
+                "duration_s": round(duration, 6),
+                "status": status,
+                **labels,
+                **attrs,
+            })
+
+    # ---------------------------
+    # Exporters
+    # ---------------------------
+
+    def open_jsonl(self, path: str):
+        """
+        Append one JSON line per finished span to `path`.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._jsonl = open(path, "a", encoding="utf-8")
+
+    def _emit(self, event: dict):
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                self._jsonl.flush()
+
+    def snapshot(self) -> dict:
+        """
+        Current values as plain data (for logging or JSON export).
+        """
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.gauges.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                     "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                    for (name, labels), h in self.histograms.items()
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            by_name: Dict[str, list] = {}
+            for (name, labels), hist in self.histograms.items():
+                by_name.setdefault(name, []).append((labels, hist))
+            for name, series in sorted(by_name.items()):
+                metric = _prom_name(name) + "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, hist in series:
+                    for upper, cumulative in zip(hist.buckets, hist.counts):
+                        lines.append(f"{metric}_bucket{_prom_labels(labels, ('le', repr(upper)))} {cumulative}")
+                    lines.append(f"{metric}_bucket{_prom_labels(labels, ('le', '+Inf'))} {hist.count}")
+                    lines.append(f"{metric}_sum{_prom_labels(labels)} {hist.sum}")
+                    lines.append(f"{metric}_count{_prom_labels(labels)} {hist.count}")
+
+            by_name = {}
+            for (name, labels), value in self.counters.items():
+                by_name.setdefault(name, []).append((labels, value))
+            for name, series in sorted(by_name.items()):
+                metric = _prom_name(name) + "_total"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in series:
+                    lines.append(f"{metric}{_prom_labels(labels)} {value}")
+
+            by_name = {}
+            for (name, labels), value in self.gauges.items():
+                by_name.setdefault(name, []).append((labels, value))
+            for name, series in sorted(by_name.items()):
+                metric = _prom_name(name)
+                lines.append(f"# TYPE {metric} gauge")
+                for labels, value in series:
+                    lines.append(f"{metric}{_prom_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Write the Prometheus text format to a file (e.g. for node_exporter's textfile collector).
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(f"{path}.tmp")
+        tmp.write_text(self.to_prometheus(), encoding="utf-8")
+        tmp.replace(path)  # atomic: scrapers never see a half-written file
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve GET /metrics (Prometheus text) and GET /metrics.json on a background thread.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.to_prometheus().encode("utf-8")
+                    ctype = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), default=str).encode("utf-8")
+                    ctype = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep the console for the conversation
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def configure(self, cfg: Optional[dict]):
+        """
+        Enable exporters from the `metrics` section of settings.yaml
+        (jsonl_path, prometheus_port, prometheus_host). prometheus_path is
+        written by the caller via write_prometheus(), e.g. at exit.
+        """
+        cfg = cfg or {}
+        if cfg.get("jsonl_path"):
+            self.open_jsonl(cfg["jsonl_path"])
+        if cfg.get("prometheus_port"):
+            self.serve(int(cfg["prometheus_port"]), cfg.get("prometheus_host", "127.0.0.1"))
+
+
+# Process-wide registry used by the engines
+REGISTRY = MetricsRegistry()
+
+
+def span(name: str, **labels):
+    return REGISTRY.span(name, **labels)
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels):
+    REGISTRY.set(name, value, **labels)
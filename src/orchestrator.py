@@ -0,0 +1,271 @@
+"""
+orchestrator.py
+
+The conversation loop of the Coach AI project, run by `python src/main.py`.
+
+Instead of blocking on input(), recording, chat(), synthesis and playback one
+after another (the original loop in main.py), every stage is an asyncio task
+and the stages are connected by queues:
+
+    input (text or voice) -> generation -> synthesis -> playback
+            utterance          sentences      audio
+
+- Recording uses SpeechToText.listen_streaming in a worker thread (transcribed while you speak)
+- Generation uses CoachEngine.reply_astream (Ollama AsyncClient)
+- Synthesis uses TextToSpeech.synthesize_async (asyncio subprocess for piper.exe)
+- Playback uses TextToSpeech.play_async
+- Blocking work (console input, Whisper, onnxruntime) runs in worker threads
+
+Barge-in: while the coach is answering, the microphone keeps listening. As soon
+as the user starts talking, playback stops, the Ollama stream and pending
+synthesis are cancelled, and the new utterance becomes the next turn.
+
+Run:
+    python src/main.py          # or python src/orchestrator.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional
+
+import numpy as np
+
+from components import load_components, load_config, warm_up
+from latency import TurnReport
+from metrics import REGISTRY
+from pipeline import SentenceSegmenter
+from vad import EnergyVAD
+
+# Marks the end of a reply in the sentence and audio queues.
+END_OF_TURN = object()
+
+
+class ConversationOrchestrator:
+    """
+    Runs the capture -> recognition -> generation -> synthesis -> playback
+    stages as concurrent asyncio tasks connected by bounded queues.
+
+    Typical usage:
+        orchestrator = ConversationOrchestrator(coach, stt, tts, language="en")
+        asyncio.run(orchestrator.run())
+    """
+
+    def __init__(
+        self,
+        coach,
+        stt,
+        tts,
+        language: str = "en",
+        min_chars: int = 12,
+        barge_in: bool = True,
+        barge_in_threshold: float = 1500.0,
+        barge_in_start_ms: int = 200,
+    ):
+        """
+        Args:
+            coach: CoachEngine instance.
+            stt: SpeechToText instance.
+            tts: TextToSpeech instance.
+            language: Language passed to Whisper for voice input.
+            min_chars: Minimum sentence length for SentenceSegmenter.
+            barge_in: Keep listening while the coach speaks and let the user interrupt.
+            barge_in_threshold: Minimum RMS (int16) counted as speech during playback.
+                                Higher than for normal recording, so the coach's own
+                                voice leaking into the microphone does not trigger it
+                                (headphones make barge-in much more reliable).
+            barge_in_start_ms: Continuous speech needed to interrupt the coach.
+        """
+        self.coach = coach
+        self.stt = stt
+        self.tts = tts
+        self.language = language
+        self.min_chars = min_chars
+        self.barge_in = barge_in
+        self.barge_in_threshold = barge_in_threshold
+        self.barge_in_start_ms = barge_in_start_ms
+        self._turn: Optional[asyncio.Future] = None
+
+    async def run(self):
+        """
+        Run the conversation until the user types 'quit' or 'exit'.
+        """
+        pending_audio = None
+        while True:
+            report = TurnReport()
+            if pending_audio is not None:
+                # the user interrupted the coach: their utterance is the next turn
+                user_input = await self._recognize(pending_audio, report)
+                pending_audio = None
+            else:
+                user_input = (await asyncio.to_thread(input, "You (press ENTER to speak): ")).strip()
+                if user_input.lower() in ("quit", "exit"):
+                    print("Session ended.")
+                    return
+                if user_input == "":
+                    # transcribed incrementally while you speak; only the tail is decoded at the end
+                    audio, user_input = await asyncio.to_thread(self.stt.listen_streaming, language=self.language)
+                    self.stt.persist(audio)  # WAV archive written in the background
+                    report.set("record", self.stt.last_timings["record_s"])
+                    report.set("transcribe", self.stt.last_timings["transcribe_s"])
+                    print(f"[Transcript] {user_input}")
+
+            if not user_input:
+                print("(Got empty input, try again)\n")
+                continue
+
+            pending_audio = await self._run_turn(user_input, report)
+            print(report.format() + "\n")
+
+    # ---------------------------
+    # Turn handling
+    # ---------------------------
+
+    async def _recognize(self, audio: np.ndarray, report: TurnReport) -> str:
+        self.stt.persist(audio)  # WAV archive written in the background
+        t0 = time.perf_counter()
+        text = await asyncio.to_thread(self.stt.transcribe_array, audio, self.language)
+        report.set("transcribe", time.perf_counter() - t0)
+        print(f"[Transcript] {text}")
+        return text
+
+    async def _run_turn(self, user_input: str, report: TurnReport) -> Optional[np.ndarray]:
+        """
+        Generate, synthesize and play one reply.
+
+        Returns:
+            The audio of the user's interruption if they barged in, else None.
+        """
+        sentences: asyncio.Queue = asyncio.Queue(maxsize=8)
+        audio: asyncio.Queue = asyncio.Queue(maxsize=4)
+        # re-enable playback once per turn; play() itself must not clear a barge-in
+        self.tts.resume()
+        report.begin_reply()
+        self._turn = asyncio.gather(
+            self._generate(user_input, sentences, report),
+            self._synthesize(sentences, audio, report),
+            self._play(audio, report),
+        )
+        if not self.barge_in:
+            await self._turn
+            return None
+
+        listener = asyncio.create_task(self._listen_for_barge_in())
+        try:
+            await self._turn
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                listener.cancel()
+                raise  # cancelled from outside, not by a barge-in
+            print("\n[Barge-in] Coach interrupted, listening...")
+            return await listener
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        return None
+
+    def _interrupt_turn(self):
+        """
+        Called as soon as the user starts talking over the coach.
+        """
+        self.tts.interrupt()          # stop audio output now
+        if self._turn is not None:
+            self._turn.cancel()       # cancels the Ollama stream and pending synthesis
+
+    async def _listen_for_barge_in(self) -> np.ndarray:
+        vad = EnergyVAD(
+            sample_rate=self.stt.sample_rate,
+            min_threshold=self.barge_in_threshold,
+            start_frames=max(1, self.barge_in_start_ms // 30),
+        )
+        return await self.stt.capture_utterance_async(
+            start_timeout=None,
+            vad=vad,
+            on_speech_start=self._interrupt_turn,
+        )
+
+    # ---------------------------
+    # Stages
+    # ---------------------------
+
+    async def _generate(self, user_input: str, sentences: asyncio.Queue, report: TurnReport):
+        segmenter = SentenceSegmenter(self.min_chars)
+        print("Coach: ", end="", flush=True)
+        try:
+            async for delta in self.coach.reply_astream(user_input):
+                report.mark_once("llm_first_token")
+                print(delta, end="", flush=True)
+                for sentence in segmenter.feed(delta):
+                    await sentences.put(sentence)
+            for sentence in segmenter.flush():
+                await sentences.put(sentence)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"\n[LLM] Generation failed: {e}")
+        report.set("llm_total", report.since_reply())
+        print("\n")
+        t = self.coach.last_timings
+        if t:
+            print(f"[LLM] prefill {t['prompt_tokens']} tok in {t['prefill_ms']:.0f} ms, "
+                  f"eval {t['eval_tokens']} tok at {t['eval_tokens_per_s']:.1f} tok/s\n")
+        await sentences.put(END_OF_TURN)
+
+    async def _synthesize(self, sentences: asyncio.Queue, audio: asyncio.Queue, report: TurnReport):
+        while True:
+            sentence = await sentences.get()
+            if sentence is END_OF_TURN:
+                await audio.put(END_OF_TURN)
+                return
+            try:
+                t0 = time.perf_counter()
+                pcm = await self.tts.synthesize_async(sentence)
+                report.add("synthesize", time.perf_counter() - t0)
+                await audio.put(pcm)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[TTS] Synthesis failed: {e}")
+
+    async def _play(self, audio: asyncio.Queue, report: TurnReport):
+        while True:
+            pcm = await audio.get()
+            if pcm is END_OF_TURN:
+                return
+            try:
+                report.mark_once("first_audio")
+                t0 = time.perf_counter()
+                await self.tts.play_async(pcm)
+                report.add("play", time.perf_counter() - t0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[TTS] Playback failed: {e}")
+
+
+async def main():
+    cfg = load_config()
+    REGISTRY.configure(cfg.get("metrics"))
+    coach, stt, tts = await asyncio.to_thread(load_components, cfg)
+    await asyncio.to_thread(warm_up, stt=stt, coach=coach, tts=tts)
+
+    barge_cfg = cfg.get("barge_in") or {}
+    orchestrator = ConversationOrchestrator(
+        coach, stt, tts,
+        barge_in=barge_cfg.get("enabled", True),
+        barge_in_threshold=barge_cfg.get("min_threshold", 1500.0),
+        barge_in_start_ms=barge_cfg.get("start_ms", 200),
+    )
+
+    print("\n=== Coach AI (offline, async) ===")
+    print("Press ENTER to speak (recording stops when you pause) or type your message.")
+    if orchestrator.barge_in:
+        print("Start talking while the coach speaks to interrupt it.")
+    print("Type 'quit' to exit.\n")
+    await orchestrator.run()
+    if (cfg.get("metrics") or {}).get("prometheus_path"):
+        REGISTRY.write_prometheus(cfg["metrics"]["prometheus_path"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
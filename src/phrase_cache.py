@@ -0,0 +1,143 @@
+"""
+phrase_cache.py
+
+Content-addressed cache of synthesized speech for the Coach AI project.
+
+Coach replies reuse the same openers and micro-action phrasing a lot, so
+TextToSpeech looks every sentence up here before running Piper. Entries are
+keyed by a SHA-256 of (voice model, normalized sentence, synthesis params),
+kept in memory within a byte budget with LRU eviction, and optionally
+persisted as .npy files so they survive restarts. Only the memory is bounded:
+the persist directory keeps every phrase ever synthesized and is never pruned.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class PhraseCache:
+    """
+    Memory-bounded LRU cache of int16 PCM buffers, with optional on-disk persistence.
+
+    Typical usage:
+        cache = PhraseCache(max_bytes=32 * 2**20, persist_dir="data/cache/tts")
+        key = cache.make_key(voice_path, "Ciao, come stai?", backend="onnx")
+        pcm = cache.get(key)
+        if pcm is None:
+            pcm = synthesize(...)
+            cache.put(key, pcm)
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 2**20, persist_dir: Optional[str] = None):
+        """
+        Args:
+            max_bytes: Memory budget for cached PCM (least recently used entries are evicted).
+            persist_dir: Optional directory where entries are also stored as <key>.npy.
+                         It grows without limit (max_bytes only bounds memory).
+        """
+        self.max_bytes = int(max_bytes)
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        if self.persist_dir is not None:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Sentence normalization used for the key: trimmed, whitespace collapsed.
+        """
+        return _WHITESPACE.sub(" ", text).strip()
+
+    @classmethod
+    def make_key(cls, voice: str, text: str, **params) -> str:
+        """
+        Cache key for a sentence spoken by a voice with the given synthesis params.
+        """
+        payload = json.dumps(
+            {"voice": voice, "text": cls.normalize(text), "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Returns the cached PCM (marking it recently used), or None.
+        """
+        with self._lock:
+            pcm = self._entries.get(key)
+            if pcm is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pcm
+        if self.persist_dir is not None:
+            path = self.persist_dir / f"{key}.npy"
+            if path.is_file():
+                try:
+                    pcm = self._freeze(np.load(path))
+                except (ValueError, OSError):
+                    pcm = None  # unreadable leftover: synthesize again and overwrite it
+                if pcm is not None:
+                    self._insert(key, pcm)
+                    with self._lock:
+                        self.hits += 1
+                    return pcm
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, pcm: np.ndarray):
+        """
+        Stores a PCM buffer (and writes it to persist_dir, if set).
+        """
+        pcm = self._freeze(pcm)
+        self._insert(key, pcm)
+        if self.persist_dir is not None:
+            # unique temp name per writer, then an atomic rename: a concurrent get()
+            # of the same phrase never loads a half-written file
+            tmp = self.persist_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, pcm)
+            tmp.replace(self.persist_dir / f"{key}.npy")
+
+    @staticmethod
+    def _freeze(pcm: np.ndarray) -> np.ndarray:
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+        pcm.setflags(write=False)  # shared between callers: must not be modified in place
+        return pcm
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _insert(self, key: str, pcm: np.ndarray):
+        if pcm.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = pcm
+            self._bytes += pcm.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
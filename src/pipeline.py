@@ -0,0 +1,71 @@
+"""
+pipeline.py
+
+Sentence-level speech pipeline for the Coach AI project.
+This module provides:
+- SentenceSegmenter: splits a stream of LLM content deltas into complete sentences,
+  which the orchestrator and the server hand to TextToSpeech one by one
+
+Why sentence pipelining:
+- The first sentence is spoken while the LLM is still generating the rest
+- Synthesis of sentence N+1 overlaps playback of sentence N
+- Time-to-first-audio becomes "first sentence" instead of "LLM + full TTS"
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List
+
+# Sentence terminator, optionally followed by closing quotes/brackets, then whitespace.
+# Newlines also close a sentence (bullet lists, short lines from the model).
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+|\n+")
+
+
+class SentenceSegmenter:
+    """
+    Accumulates streamed text and returns sentences as soon as they are complete.
+
+    Typical usage:
+        seg = SentenceSegmenter()
+        for delta in coach.reply_stream(text):
+            for sentence in seg.feed(delta):
+                ...
+        for sentence in seg.flush():
+            ...
+    """
+
+    def __init__(self, min_chars: int = 12):
+        """
+        Args:
+            min_chars: Sentences shorter than this are merged with the next one,
+                       so tiny fragments ("Ok.", "1.") do not pay a synthesis call each.
+        """
+        self.min_chars = int(min_chars)
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        Add a content delta and return the sentences it completed (possibly none).
+        """
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars:
+                # too short: keep it in the buffer and glue it to the next sentence
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """
+        Return whatever text is left (the last, possibly unterminated, sentence).
+        """
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
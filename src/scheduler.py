@@ -0,0 +1,210 @@
+"""
+scheduler.py
+
+Admission control for the shared CoachEngine in the multi-session server.
+
+Without a limit every concurrent turn opens its own Ollama stream; Ollama then
+time-slices all of them (or queues them beyond OLLAMA_NUM_PARALLEL) and every
+user's latency grows together. CoachScheduler sits in front of the Ollama client:
+
+- At most `max_concurrent` generations run at once (match OLLAMA_NUM_PARALLEL)
+- Waiting requests are queued per session and served round-robin across
+  sessions, so one chatty client cannot starve the others
+- Load shedding: a request is refused right away with SchedulerBusy when the
+  queue is full or its predicted wait exceeds `max_wait_s`, and is dropped from
+  the queue if it actually waits longer than that. The prediction replays the
+  queue over the running generations: each is expected to end `service_s`
+  (moving average) after it started, and each request ahead takes the first
+  slot that frees up
+- Metrics: scheduler.wait histogram, scheduler.shed counter by reason,
+  scheduler.queue_depth / scheduler.active gauges (see metrics.py)
+
+Usage:
+    scheduler = CoachScheduler(max_concurrent=2, max_wait_s=5.0)
+    with scheduler.slot(session_id):
+        for delta in coach.reply_stream(text, history=history):
+            ...
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+from metrics import inc, observe, set_gauge
+
+
+class SchedulerBusy(RuntimeError):
+    """
+    Raised instead of queueing when the coach is overloaded.
+    `retry_after` is a hint in seconds for the client.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Coach is busy ({reason}), retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CoachScheduler:
+    """
+    Thread-safe concurrency cap with per-session fair queueing and load shedding.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        max_wait_s: float = 5.0,
+        max_queue: int = 64,
+        initial_service_s: float = 3.0,
+    ):
+        """
+        Args:
+            max_concurrent: Generations allowed to run at the same time.
+            max_wait_s: Queueing deadline; requests expected or found to wait longer are shed.
+            max_queue: Waiting requests allowed across all sessions (beyond it: shed at once).
+            initial_service_s: Generation time assumed until real ones are measured.
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be >= 1")
+        self.max_concurrent = int(max_concurrent)
+        self.max_wait_s = float(max_wait_s)
+        self.max_queue = int(max_queue)
+        # exponential moving average of how long a slot is held
+        self.service_s = float(initial_service_s)
+        # slot token -> monotonic start time of the generation holding it
+        self._running: Dict[object, float] = {}
+        self._waiting = 0
+        # session -> its waiting tickets; key order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[object]]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    @property
+    def active(self) -> int:
+        return len(self._running)
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _publish(self):
+        # caller holds self._cond
+        set_gauge("scheduler.active", len(self._running))
+        set_gauge("scheduler.queue_depth", self._waiting)
+
+    def _expected_wait(self, position: int) -> float:
+        """
+        Predicted wait for the request at `position` (0 = next) in the queue.
+        """
+        now = time.monotonic()
+        # when each slot is expected to be free: running generations end service_s
+        # after their start (now, if they already overran the average)
+        free_at = [max(now, started + self.service_s) for started in self._running.values()]
+        free_at += [now] * (self.max_concurrent - len(free_at))
+        heapq.heapify(free_at)
+        for _ in range(position):
+            heapq.heappush(free_at, heapq.heappop(free_at) + self.service_s)
+        return free_at[0] - now
+
+    def _has_free_slot(self) -> bool:
+        return len(self._running) < self.max_concurrent
+
+    def _shed(self, reason: str, retry_after: float):
+        inc("scheduler.shed", reason=reason)
+        raise SchedulerBusy(reason, max(1.0, retry_after))
+
+    def _is_next(self, session_id: str, ticket: object) -> bool:
+        # the head ticket of the first session in round-robin order goes next
+        head = next(iter(self._queues.items()), None)
+        return head is not None and head[0] == session_id and head[1][0] is ticket
+
+    def _dequeue(self, session_id: str, ticket: object):
+        queue = self._queues[session_id]
+        queue.remove(ticket)
+        self._waiting -= 1
+        if not queue:
+            del self._queues[session_id]
+        else:
+            # the session's next request waits for every other session's turn
+            self._queues.move_to_end(session_id)
+
+    def acquire(self, session_id: str) -> object:
+        """
+        Block until a slot is free for this session.
+
+        Returns:
+            object: Slot token to pass to release().
+
+        Raises:
+            SchedulerBusy: The request was shed (queue full, predicted or actual wait too long).
+        """
+        start = time.monotonic()
+        token = object()
+        with self._cond:
+            if self._has_free_slot() and not self._waiting:
+                self._running[token] = start
+                self._publish()
+                observe("scheduler.wait", 0.0)
+                return token
+            if self._waiting >= self.max_queue:
+                self._shed("queue_full", self._expected_wait(self._waiting))
+            expected = self._expected_wait(self._waiting)
+            if expected > self.max_wait_s:
+                self._shed("predicted_wait", expected)
+
+            ticket = token
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._waiting += 1
+            self._publish()
+            deadline = start + self.max_wait_s
+            while not (self._has_free_slot() and self._is_next(session_id, ticket)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._dequeue(session_id, ticket)
+                    self._publish()
+                    self._cond.notify_all()  # the next ticket may now be at the head
+                    self._shed("deadline", self.service_s)
+                self._cond.wait(remaining)
+
+            self._dequeue(session_id, ticket)
+            admitted = time.monotonic()
+            self._running[token] = admitted
+            self._publish()
+            self._cond.notify_all()  # another slot may still be free for the new head
+        observe("scheduler.wait", admitted - start)
+        return token
+
+    def release(self, token: object):
+        """
+        Free the slot of `token`; how long it was held updates the wait prediction.
+        """
+        with self._cond:
+            started = self._running.pop(token)
+            self.service_s = 0.8 * self.service_s + 0.2 * (time.monotonic() - started)
+            self._publish()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session_id: str) -> Iterator[float]:
+        """
+        Hold a generation slot for the duration of the block; yields the queue wait.
+        """
+        requested = time.monotonic()
+        token = self.acquire(session_id)
+        try:
+            yield self._running[token] - requested
+        finally:
+            self.release(token)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "active": len(self._running),
+                "waiting": self._waiting,
+                "sessions_waiting": len(self._queues),
+                "service_s": round(self.service_s, 3),
+            }
@@ -0,0 +1,492 @@
+"""
+server.py
+
+Multi-session HTTP server for the Coach AI project.
+
+One process loads SpeechToText, CoachEngine and TextToSpeech once and serves
+many independent conversations with them. Each session only owns its
+ConversationHistory; the models are shared, so memory is paid once and
+concurrency is limited by compute (one handler thread per request).
+
+API (JSON in, JSON or NDJSON out):
+    POST   /sessions                  -> {"session_id": ...}
+    GET    /sessions/<id>             -> turns, history tokens, idle time
+    POST   /sessions/<id>/reset       -> forget the conversation, keep the session (409 during a turn)
+    DELETE /sessions/<id>             -> close the session
+    POST   /sessions/<id>/turn        -> NDJSON stream of events for one turn
+    GET    /health                    -> {"status": "ok", "sessions": n}
+    GET    /metrics                   -> Prometheus text (see metrics.py)
+
+Voice turns from different sessions are transcribed together by a
+TranscriptionBatcher (see transcription_batcher.py) when stt_batch_size > 1.
+Batched or not, uploaded WAVs go through the same Silero VAD pass before
+Whisper, so a turn's transcript does not depend on the batching setting.
+Generation goes through a CoachScheduler (see scheduler.py): when Ollama is
+saturated a turn is refused with 503 + Retry-After instead of slowing everyone down.
+
+A turn takes either JSON {"text": "..."} or a WAV file (Content-Type audio/wav).
+Query parameters: speak=1 to receive synthesized audio, language=xx for the STT.
+Events, one JSON object per line, flushed as soon as they are ready:
+    {"type": "transcript", "text": ...}                 (audio input only)
+    {"type": "sentence", "text": ..., "audio": ...}     (audio = base64 WAV, if speak=1)
+    {"type": "done", "reply": ..., "timings": {...}}
+    {"type": "busy", "error": ..., "retry_after": s}  (shed after the transcript was sent)
+    {"type": "error", "error": ...}
+
+Run:
+    python src/server.py            # host/port from the `server` section of settings.yaml
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import json
+import threading
+import time
+import uuid
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from coach import CoachEngine, ConversationHistory
+from components import load_components, load_config, warm_up
+from metrics import REGISTRY, inc, observe, span
+from pipeline import SentenceSegmenter
+from scheduler import CoachScheduler, SchedulerBusy
+from stt import SpeechToText
+from transcription_batcher import TranscriptionBatcher
+from tts import TextToSpeech
+
+
+class SessionError(Exception):
+    """
+    A request that cannot be served for this session; carries the HTTP status.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    """
+    Per-user conversation state. Only one turn per session runs at a time.
+    """
+
+    def __init__(self, session_id: str, history: ConversationHistory):
+        self.id = session_id
+        self.history = history
+        self.turns = 0
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.lock = threading.Lock()
+
+    def info(self) -> dict:
+        return {
+            "session_id": self.id,
+            "turns": self.turns,
+            "history_tokens": self.history.total_tokens(),
+            "idle_s": round(time.monotonic() - self.last_used, 1),
+        }
+
+
+class SessionManager:
+    """
+    Thread-safe registry of the open sessions, with a size cap and idle expiry.
+    """
+
+    def __init__(self, coach: CoachEngine, max_sessions: int = 100, idle_timeout_s: float = 1800.0):
+        """
+        Args:
+            coach: Used to create histories with the configured token budget.
+            max_sessions: Open sessions allowed at once (new ones are refused beyond it).
+            idle_timeout_s: Sessions unused for longer than this are closed (0 = never).
+        """
+        self.coach = coach
+        self.max_sessions = int(max_sessions)
+        self.idle_timeout_s = float(idle_timeout_s)
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expire(self):
+        # caller holds self._lock
+        if not self.idle_timeout_s:
+            return
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.idle_timeout_s and not session.lock.locked():
+                del self._sessions[session_id]
+                inc("server.sessions_closed", reason="idle")
+
+    def create(self) -> Session:
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionError(503, f"Too many open sessions ({self.max_sessions})")
+            session = Session(uuid.uuid4().hex, self.coach.new_history())
+            self._sessions[session.id] = session
+        inc("server.sessions_opened")
+        return session
+
+    def get(self, session_id: str) -> Session:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionError(404, f"Unknown session: {session_id}")
+        session.last_used = time.monotonic()
+        return session
+
+    def close(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise SessionError(404, f"Unknown session: {session_id}")
+        inc("server.sessions_closed", reason="client")
+
+
+def decode_wav(data: bytes, sample_rate: int) -> np.ndarray:
+    """
+    Decode a 16-bit PCM WAV upload into mono int16 samples at `sample_rate`.
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise SessionError(415, "Only 16-bit PCM WAV is supported")
+            channels, rate = wf.getnchannels(), wf.getframerate()
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    except (wave.Error, EOFError) as e:
+        raise SessionError(400, f"Invalid WAV: {e}")
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != sample_rate and audio.size:
+        n_out = int(round(audio.size * sample_rate / rate))
+        positions = np.linspace(0, audio.size - 1, n_out)
+        audio = np.interp(positions, np.arange(audio.size), audio).astype(np.int16)
+    return audio
+
+
+def encode_wav(pcm: np.ndarray, sample_rate: int) -> bytes:
+    """
+    Wrap int16 mono PCM in a WAV container.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(np.asarray(pcm, dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+class CoachServer:
+    """
+    Owns the shared engines and the sessions; the HTTP handler only parses requests.
+    """
+
+    def __init__(
+        self,
+        coach: CoachEngine,
+        stt: Optional[SpeechToText],
+        tts: Optional[TextToSpeech],
+        max_sessions: int = 100,
+        idle_timeout_s: float = 1800.0,
+        min_chars: int = 12,
+        scheduler: Optional[CoachScheduler] = None,
+        batcher: Optional[TranscriptionBatcher] = None,
+    ):
+        """
+        Args:
+            coach: Shared CoachEngine (Ollama client).
+            stt: Shared SpeechToText, or None to accept text turns only.
+            tts: Shared TextToSpeech, or None to never return audio.
+            max_sessions / idle_timeout_s: See SessionManager.
+            min_chars: SentenceSegmenter threshold for the streamed sentences.
+            scheduler: Admission control in front of Ollama; None = no limit.
+            batcher: Micro-batches voice turns across sessions; None = one clip per call.
+        """
+        self.coach = coach
+        self.stt = stt
+        self.tts = tts
+        self.min_chars = min_chars
+        self.scheduler = scheduler
+        self.batcher = batcher
+        # synthesis runs off the generation path, so the scheduler slot is only held for Ollama
+        self._synth = ThreadPoolExecutor(
+            max_workers=max(1, getattr(tts, "workers", 1)), thread_name_prefix="server-tts"
+        )
+        self.sessions = SessionManager(coach, max_sessions=max_sessions, idle_timeout_s=idle_timeout_s)
+
+    def reset(self, session: Session):
+        """
+        Forget the session's conversation. Refused with 409 while a turn is running,
+        which would otherwise store its turn in the history just cleared.
+        """
+        if not session.lock.acquire(blocking=False):
+            raise SessionError(409, "A turn is already running for this session")
+        try:
+            session.history.clear()
+        finally:
+            session.lock.release()
+
+    def turn(
+        self,
+        session: Session,
+        text: Optional[str] = None,
+        audio: Optional[np.ndarray] = None,
+        language: Optional[str] = None,
+        speak: bool = False,
+    ) -> Iterator[dict]:
+        """
+        Run one turn for a session, yielding events as they become available.
+
+        The session lock is held for the whole turn, so a session's history is
+        never updated by two turns at once; other sessions are not blocked.
+        The scheduler slot is held only while the reply is generated: sentences
+        are synthesized on worker threads meanwhile, and audio still pending
+        when the stream ends is awaited after the slot is released.
+        SchedulerBusy propagates to the caller.
+        """
+        if not session.lock.acquire(blocking=False):
+            raise SessionError(409, "A turn is already running for this session")
+        try:
+            start = time.perf_counter()
+            timings = {}
+            with span("server.turn", input="audio" if audio is not None else "text", speak=speak):
+                if audio is not None:
+                    if self.stt is None:
+                        raise SessionError(501, "Speech input is disabled on this server")
+                    transcribe = self.batcher.transcribe if self.batcher else self.stt.transcribe_array
+                    text = transcribe(audio, language=language)
+                    timings["transcribe_s"] = time.perf_counter() - start
+                    yield {"type": "transcript", "text": text}
+                if not text:
+                    raise SessionError(400, "Empty input")
+                if speak and self.tts is None:
+                    raise SessionError(501, "Speech output is disabled on this server")
+
+                segmenter = SentenceSegmenter(min_chars=self.min_chars)
+                parts = []
+                # (sentence, synthesis future or None), in reply order
+                pending: deque = deque()
+
+                def queue_sentence(sentence: str):
+                    future = self._synth.submit(self.tts.synthesize, sentence) if speak else None
+                    pending.append((sentence, future))
+
+                def ready_events(wait: bool) -> Iterator[dict]:
+                    # sentences go out in order, each as soon as its audio (if any) is ready
+                    while pending and (wait or pending[0][1] is None or pending[0][1].done()):
+                        sentence, future = pending.popleft()
+                        event = {"type": "sentence", "text": sentence}
+                        if future is not None:
+                            pcm = future.result()
+                            event["audio"] = base64.b64encode(encode_wav(pcm, self.tts.sample_rate)).decode("ascii")
+                            timings.setdefault("first_audio_s", time.perf_counter() - start)
+                        yield event
+
+                try:
+                    admission = self.scheduler.slot(session.id) if self.scheduler else nullcontext(0.0)
+                    with admission as waited:
+                        timings["queue_s"] = waited
+                        # history= keeps the shared engine stateless: each session brings its own memory
+                        for delta in self.coach.reply_stream(text, history=session.history):
+                            if not parts:
+                                timings["first_token_s"] = time.perf_counter() - start
+                            parts.append(delta)
+                            for sentence in segmenter.feed(delta):
+                                queue_sentence(sentence)
+                            yield from ready_events(wait=False)
+                        for sentence in segmenter.flush():
+                            queue_sentence(sentence)
+                    yield from ready_events(wait=True)
+                finally:
+                    for _, future in pending:  # client gone or generation failed
+                        if future is not None:
+                            future.cancel()
+
+            timings["total_s"] = time.perf_counter() - start
+            if "first_audio_s" in timings:
+                observe("server.first_audio", timings["first_audio_s"])
+            session.turns += 1
+            session.last_used = time.monotonic()
+            yield {"type": "done", "reply": "".join(parts), "timings": {k: round(v, 3) for k, v in timings.items()}}
+        finally:
+            session.lock.release()
+
+    def close(self):
+        self._synth.shutdown(wait=False, cancel_futures=True)
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def _dispatch(self, method: str):
+                url = urlparse(self.path)
+                parts = [p for p in url.path.split("/") if p]
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    if method == "GET" and parts == ["health"]:
+                        health = {"status": "ok", "sessions": len(server.sessions)}
+                        if server.scheduler is not None:
+                            health["scheduler"] = server.scheduler.stats()
+                        self._send_json(health)
+                    elif method == "GET" and parts == ["metrics"]:
+                        self._send(200, REGISTRY.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+                    elif method == "POST" and parts == ["sessions"]:
+                        self._send_json(server.sessions.create().info(), status=201)
+                    elif len(parts) == 2 and parts[0] == "sessions" and method == "GET":
+                        self._send_json(server.sessions.get(parts[1]).info())
+                    elif len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+                        server.sessions.close(parts[1])
+                        self._send_json({"closed": parts[1]})
+                    elif len(parts) == 3 and parts[0] == "sessions" and method == "POST" and parts[2] == "reset":
+                        session = server.sessions.get(parts[1])
+                        server.reset(session)
+                        self._send_json(session.info())
+                    elif len(parts) == 3 and parts[0] == "sessions" and method == "POST" and parts[2] == "turn":
+                        self._turn(server.sessions.get(parts[1]), query)
+                    else:
+                        raise SessionError(404, f"No route for {method} {url.path}")
+                except SchedulerBusy as e:
+                    self._send_json({"error": str(e), "retry_after": e.retry_after}, status=503,
+                                    headers={"Retry-After": str(int(e.retry_after + 0.5))})
+                except SessionError as e:
+                    self._send_json({"error": str(e)}, status=e.status)
+                except Exception as e:
+                    print(f"[Server] {method} {url.path} failed: {e}")
+                    self._send_json({"error": str(e)}, status=500)
+
+            def _turn(self, session: Session, query: dict):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                text = audio = None
+                if self.headers.get("Content-Type", "").startswith(("audio/wav", "audio/x-wav", "audio/wave")):
+                    if server.stt is None:
+                        raise SessionError(501, "Speech input is disabled on this server")
+                    audio = decode_wav(body, server.stt.sample_rate)
+                else:
+                    try:
+                        text = (json.loads(body or b"{}").get("text") or "").strip()
+                    except (json.JSONDecodeError, AttributeError):
+                        raise SessionError(400, 'Expected JSON {"text": ...} or an audio/wav body')
+
+                events = server.turn(
+                    session, text=text, audio=audio,
+                    language=query.get("language") or None,
+                    speak=query.get("speak", "0") in ("1", "true", "yes"),
+                )
+                # The first event decides the status: errors before any output are plain JSON responses
+                first = next(events)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    self._write_event(first)
+                    for event in events:
+                        self._write_event(event)
+                except (BrokenPipeError, ConnectionResetError):
+                    inc("server.disconnects")
+                except SchedulerBusy as e:
+                    self._write_event({"type": "busy", "error": str(e), "retry_after": e.retry_after})
+                except Exception as e:
+                    print(f"[Server] turn failed for {session.id}: {e}")
+                    self._write_event({"type": "error", "error": str(e)})
+                finally:
+                    events.close()  # on disconnect: stops the Ollama stream, keeps the partial reply
+                try:
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _write_event(self, event: dict):
+                data = json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, body: dict, status: int = 200, headers: Optional[dict] = None):
+                self._send(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json", headers)
+
+            def _send(self, status: int, data: bytes, content_type: str, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass  # turns are reported through metrics.py
+
+        return Handler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+        httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        httpd.daemon_threads = True
+        return httpd
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    REGISTRY.configure(cfg.get("metrics"))
+    server_cfg = cfg.get("server") or {}
+    scheduler_cfg = cfg.get("scheduler") or {}
+    # the server never plays audio itself: no OutputStream on the host's sound card
+    cfg["tts"] = dict(cfg.get("tts") or {}, in_memory=False)
+
+    coach, stt, tts = load_components(cfg)
+    warm_up(stt=stt, coach=coach, tts=tts)
+    batcher = None
+    if int(server_cfg.get("stt_batch_size", 8)) > 1:
+        batcher = TranscriptionBatcher(
+            stt,
+            max_batch_size=int(server_cfg.get("stt_batch_size", 8)),
+            max_wait_ms=float(server_cfg.get("stt_batch_wait_ms", 30)),
+            workers=stt.num_workers,
+        )
+
+    server = CoachServer(
+        coach, stt, tts,
+        max_sessions=server_cfg.get("max_sessions", 100),
+        idle_timeout_s=server_cfg.get("idle_timeout_s", 1800),
+        scheduler=CoachScheduler(
+            max_concurrent=scheduler_cfg.get("max_concurrent", 2),
+            max_wait_s=scheduler_cfg.get("max_wait_s", 5.0),
+            max_queue=scheduler_cfg.get("max_queue", 64),
+        ),
+        batcher=batcher,
+    )
+    httpd = server.serve(server_cfg.get("host", "127.0.0.1"), int(server_cfg.get("port", 8080)))
+    host, port = httpd.server_address[:2]
+    print(f"[Server] listening on http://{host}:{port} (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("[Server] shutting down")
+    finally:
+        httpd.server_close()
+        server.close()
+        if batcher is not None:
+            batcher.close()
@@ -4,6 +4,10 @@ stt.py
 Speech-to-Text utilities for the Coach AI project.
 This module provides:
 - Microphone recording to a WAV file (16 kHz, mono)
+- Voice-activity-driven recording that stops on trailing silence (EnergyVAD, see vad.py)
+- In-memory transcription of NumPy audio (no WAV round-trip on the critical path)
+- Batched transcription of many short utterances in one encoder/decoder call (transcribe_many)
+- Streaming recognition during capture with local-agreement stabilization (StreamingTranscriber)
 - Offline transcription using Faster-Whisper (Whisper model, quantized and fast)
 - Minimal device helpers for debugging audio issues on Windows
 
@@ -11,19 +15,49 @@ Why Faster-Whisper:
 - Optimized inference, supports CPU/GPU
 - Built-in VAD filter to skip silences
 - Easy to switch model size: tiny/base/small/medium/large-v3
+- Device auto-detection: CUDA when available, CPU otherwise (with per-device compute type)
+- Optional on-disk cache of transcripts keyed by audio content (TranscriptCache)
 """
 
 from __future__ import annotations
 
+import asyncio
+import queue
+import threading
 import time
 import uuid
 import wave
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List
+from typing import Callable, Optional, List, Tuple
 
+import ctranslate2
 import numpy as np
 import sounddevice as sd
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_suppressed_tokens
+from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps
+
+from metrics import inc, span
+from transcript_cache import TranscriptCache
+from vad import EnergyVAD, UtteranceCollector  # noqa: F401 (re-exported)
+
+# Sample rate Whisper models are trained on
+WHISPER_SAMPLE_RATE = 16000
+
+# transcribe_many returns "" for utterances whose no-speech probability is above
+# NO_SPEECH_THRESHOLD and whose average token log-probability is below
+# LOG_PROB_THRESHOLD (the same rule as Whisper / faster-whisper)
+NO_SPEECH_THRESHOLD = 0.6
+LOG_PROB_THRESHOLD = -1.0
+
+# Precision used when compute_type="auto", per inference device
+DEFAULT_COMPUTE_TYPES = {
+    "cuda": "float16",
+    "cpu": "int8",
+}
 
 
 class SpeechToText:
@@ -36,9 +70,10 @@ class SpeechToText:
             sample_rate=16000,
             audio_dir="data/audio_raw",
             device_index=None,      # use default input device
-            compute_type="int8"     # good default for CPU; "float16"/"int8_float16" for GPU
+            device="auto",          # CUDA if available, else CPU
+            compute_type="auto"     # float16 on GPU, int8 on CPU
         )
-        wav = stt.record_wav(seconds=10)   # record from mic
+        wav = stt.record_utterance()       # record from mic until the user stops talking
         text = stt.transcribe(wav, language="it")  # offline transcription
     """
 
@@ -48,7 +83,12 @@ class SpeechToText:
         sample_rate: int = 16000,
         audio_dir: str = "data/audio_raw",
         device_index: Optional[int] = None,
-        compute_type: str = "int8",
+        compute_type: str = "auto",
+        persist_audio: bool = True,
+        device: str = "auto",
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        cache: Optional[TranscriptCache] = None,
     ):
         """
         Args:
@@ -57,23 +97,101 @@ class SpeechToText:
             sample_rate: Recording sample rate (Whisper works well at 16 kHz).
             audio_dir: Directory where raw recordings are stored.
             device_index: Optional input device index from sounddevice; None = default.
-            compute_type: Inference precision. "int8" is fast on CPU. If you have GPU,
-                          try "float16" or "int8_float16" for better accuracy.
+            compute_type: Inference precision. "auto" picks per device (see DEFAULT_COMPUTE_TYPES):
+                          "int8" is fast on CPU, "float16"/"int8_float16" suit GPUs.
+            persist_audio: Whether persist() archives utterances as WAV in audio_dir.
+                           Writes happen on a background thread, off the critical path.
+            device: "auto" (CUDA if a GPU is visible, falling back to CPU if it fails to load),
+                    "cuda" or "cpu".
+            cpu_threads: CPU threads per inference (0 = CTranslate2 default / OMP_NUM_THREADS).
+            num_workers: Parallel transcriptions the model can run when called from several threads.
+            cache: Optional TranscriptCache; unchanged audio transcribed with the same
+                   settings is then returned without running the model.
         """
         self.model_size = model_size
         self.sample_rate = int(sample_rate)
         self.audio_dir = Path(audio_dir)
         self.audio_dir.mkdir(parents=True, exist_ok=True)
         self.device_index = device_index
+        self.persist_audio = bool(persist_audio)
+        self.cache = cache
+        # Timings of the last listen_streaming() call: record_s, transcribe_s
+        self.last_timings: dict = {}
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-writer")
 
         # Initialize Faster-Whisper model. The first run will download weights.
         # This object is heavy, so we keep one instance per process.
-        self.model = WhisperModel(
-            self.model_size,
-            device="cuda",        # force GPU
-            compute_type=compute_type
-        )
+        self.cpu_threads = int(cpu_threads)
+        self.num_workers = int(num_workers)
+        self.model, self.device, self.compute_type = self._load_model(device, compute_type)
+        print(f"[STT] Whisper '{self.model_size}' on {self.device} ({self.compute_type})")
 
+    @staticmethod
+    def detect_device() -> str:
+        """
+        Returns "cuda" if CTranslate2 sees a CUDA device, else "cpu".
+        """
+        try:
+            return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        except Exception:
+            return "cpu"
+
+    def _load_model(self, device: str, compute_type: str):
+        """
+        Loads the WhisperModel following the device fallback chain.
+
+        With device="auto" the chain is cuda -> cpu: a GPU that is visible but
+        unusable (missing cuDNN/cuBLAS, out of memory) falls back to CPU instead
+        of crashing. CTranslate2 loads the CUDA libraries lazily, so each device
+        must also pass a probe encode (_probe) before it is accepted.
+        An explicit device is tried alone.
+
+        Returns:
+            (model, device, compute_type) actually used.
+        """
+        if device == "auto":
+            chain = ["cuda", "cpu"] if self.detect_device() == "cuda" else ["cpu"]
+        else:
+            chain = [device]
+
+        last_error = None
+        for dev in chain:
+            ctype = DEFAULT_COMPUTE_TYPES[dev] if compute_type == "auto" else compute_type
+            try:
+                model = WhisperModel(
+                    self.model_size,
+                    device=dev,
+                    compute_type=ctype,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.num_workers,
+                )
+                self._probe(model)
+                return model, dev, ctype
+            except (RuntimeError, ValueError, OSError) as e:
+                print(f"[STT] Could not load Whisper on {dev} ({ctype}): {e}")
+                last_error = e
+        raise RuntimeError(f"Whisper model could not be loaded on {chain}") from last_error
+
+    @staticmethod
+    def _probe(model: WhisperModel):
+        """
+        Encodes 1 s of silence: this is where a missing cuDNN/cuBLAS or a GPU
+        out of memory surfaces, not in the WhisperModel constructor.
+        """
+        silence = np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32)
+        model.encode(pad_or_trim(model.feature_extractor(silence)[..., :-1]))
+
+    def warmup(self):
+        """
+        Run one transcription of a short silent clip so the first real utterance
+        does not pay for lazy model initialization (weights, kernels, caches).
+        """
+        silence = np.zeros(self.sample_rate, dtype=np.float32)  # 1 s
+        # VAD off, otherwise the silence is skipped and the encoder never runs
+        segments, _ = self.model.transcribe(silence, language="en", beam_size=1, vad_filter=False)
+        for _ in segments:  # segments are generated lazily
+            pass
 
     # ---------------------------
     # Microphone utilities
@@ -101,31 +219,240 @@ class SpeechToText:
         Returns:
             Path to the saved WAV file (string).
         """
-        # Generate a unique filename (timestamp + short UUID)
-        fname = self.audio_dir / f"rec_{int(time.time())}_{uuid.uuid4().hex[:6]}.wav"
+        with span("stt.record", mode="fixed"):
+            # Generate a unique filename (timestamp + short UUID)
+            fname = self.audio_dir / f"rec_{int(time.time())}_{uuid.uuid4().hex[:6]}.wav"
+
+            # Allocate recording buffer: mono, int16
+            frames = int(self.sample_rate * seconds)
+            print(f"[STT] Recording {seconds:.1f}s at {self.sample_rate} Hz...")
+            audio = sd.rec(
+                frames,
+                samplerate=self.sample_rate,
+                channels=1,
+                dtype="int16",
+                device=self.device_index,
+            )
+            sd.wait()  # block until recording finishes
+            print("[STT] Done recording.")
 
-        # Allocate recording buffer: mono, int16
-        frames = int(self.sample_rate * seconds)
-        print(f"[STT] Recording {seconds:.1f}s at {self.sample_rate} Hz...")
-        audio = sd.rec(
-            frames,
+            # Write PCM to WAV
+            with wave.open(str(fname), "wb") as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)  # 16-bit PCM -> 2 bytes
+                wf.setframerate(self.sample_rate)
+                wf.writeframes(audio.tobytes())
+
+            return str(fname)
+
+    def capture_utterance(
+        self,
+        silence_ms: int = 800,
+        start_timeout: float = 10.0,
+        max_seconds: Optional[float] = None,
+        preroll_ms: int = 300,
+        on_audio: Optional[Callable[[np.ndarray], None]] = None,
+    ) -> np.ndarray:
+        """
+        Records from the microphone until the user stops talking.
+
+        Audio is read from a sounddevice.InputStream callback and fed frame by
+        frame to an EnergyVAD; recording stops after `silence_ms` of trailing
+        silence, so short answers cost no dead air and long ones are not cut.
+
+        Args:
+            silence_ms: Trailing silence that ends the utterance.
+            start_timeout: Give up if no speech starts within this many seconds.
+            max_seconds: Optional safety cap on the utterance length (None = no cap).
+            preroll_ms: Audio kept from before the detected speech start
+                        (so the first syllable is not clipped).
+            on_audio: Optional callback receiving the utterance audio while it is
+                      captured (pre-roll first, then each frame), e.g. for streaming STT.
+
+        Returns:
+            int16 mono samples at self.sample_rate (empty if nobody spoke).
+        """
+        with span("stt.record", mode="vad"):
+            collector = UtteranceCollector(
+                EnergyVAD(sample_rate=self.sample_rate, silence_ms=silence_ms),
+                preroll_ms=preroll_ms,
+                max_seconds=max_seconds,
+                on_audio=on_audio,
+            )
+            frames: "queue.Queue[np.ndarray]" = queue.Queue()
+
+            def callback(indata, _frames, _time, status):
+                if status:
+                    print(f"[STT] {status}")
+                frames.put(indata[:, 0].copy())
+
+            deadline = time.monotonic() + start_timeout
+
+            print("[STT] Listening... (speak, I'll stop when you pause)")
+            with self._input_stream(collector.vad.frame_len, callback):
+                while True:
+                    try:
+                        if collector.add(frames.get(timeout=0.5)):
+                            break
+                    except queue.Empty:
+                        pass
+                    if not collector.started and time.monotonic() > deadline:
+                        print("[STT] No speech detected.")
+                        return np.zeros(0, dtype=np.int16)
+            print("[STT] Done recording.")
+            return collector.audio()
+
+    async def capture_utterance_async(
+        self,
+        silence_ms: int = 800,
+        start_timeout: Optional[float] = 10.0,
+        max_seconds: Optional[float] = None,
+        preroll_ms: int = 300,
+        on_audio: Optional[Callable[[np.ndarray], None]] = None,
+        on_speech_start: Optional[Callable[[], None]] = None,
+        vad: Optional[EnergyVAD] = None,
+    ) -> np.ndarray:
+        """
+        asyncio version of capture_utterance: frames from the InputStream callback
+        are handed to the event loop, so other tasks keep running while recording.
+        Same arguments and return value as capture_utterance, plus:
+
+        Args:
+            start_timeout: None waits for speech indefinitely (e.g. barge-in listening).
+            on_speech_start: Called (in the event loop) as soon as speech is detected.
+            vad: Custom EnergyVAD (e.g. higher threshold while the coach is speaking);
+                 by default one is built from silence_ms.
+        """
+        with span("stt.record", mode="vad_async"):
+            loop = asyncio.get_running_loop()
+            collector = UtteranceCollector(
+                vad or EnergyVAD(sample_rate=self.sample_rate, silence_ms=silence_ms),
+                preroll_ms=preroll_ms,
+                max_seconds=max_seconds,
+                on_audio=on_audio,
+                on_speech_start=on_speech_start,
+            )
+            frames: "asyncio.Queue[np.ndarray]" = asyncio.Queue()
+
+            def callback(indata, _frames, _time, status):
+                if status:
+                    print(f"[STT] {status}")
+                loop.call_soon_threadsafe(frames.put_nowait, indata[:, 0].copy())
+
+            deadline = time.monotonic() + start_timeout if start_timeout is not None else None
+
+            if on_speech_start is None:
+                print("[STT] Listening... (speak, I'll stop when you pause)")
+            with self._input_stream(collector.vad.frame_len, callback):
+                while True:
+                    try:
+                        if collector.add(await asyncio.wait_for(frames.get(), timeout=0.5)):
+                            break
+                    except asyncio.TimeoutError:
+                        pass
+                    if not collector.started and deadline is not None and time.monotonic() > deadline:
+                        print("[STT] No speech detected.")
+                        return np.zeros(0, dtype=np.int16)
+            print("[STT] Done recording.")
+            return collector.audio()
+
+    def _input_stream(self, blocksize: int, callback) -> "sd.InputStream":
+        """
+        Mono int16 microphone stream delivering `blocksize` frames per callback.
+        """
+        return sd.InputStream(
             samplerate=self.sample_rate,
             channels=1,
             dtype="int16",
+            blocksize=blocksize,
             device=self.device_index,
+            callback=callback,
         )
-        sd.wait()  # block until recording finishes
-        print("[STT] Done recording.")
 
-        # Write PCM to WAV
+    def save_wav(self, audio: np.ndarray) -> str:
+        """
+        Saves int16 mono samples as a WAV in audio_dir.
+
+        Returns:
+            Path to the saved WAV file (string).
+        """
+        # Generate a unique filename (timestamp + short UUID)
+        fname = self.audio_dir / f"rec_{int(time.time())}_{uuid.uuid4().hex[:6]}.wav"
         with wave.open(str(fname), "wb") as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)  # 16-bit PCM -> 2 bytes
             wf.setframerate(self.sample_rate)
-            wf.writeframes(audio.tobytes())
-
+            wf.writeframes(audio.astype(np.int16).tobytes())
         return str(fname)
 
+    def listen_streaming(
+        self,
+        language: Optional[str] = None,
+        beam_size: int = 1,
+        step_s: float = 1.0,
+        **capture_kwargs,
+    ) -> Tuple[np.ndarray, str]:
+        """
+        Records one utterance while transcribing it incrementally.
+
+        A background thread runs a StreamingTranscriber every `step_s` seconds
+        on the audio captured so far, so when end-of-speech is detected most of
+        the transcript is already committed and only the tail is decoded.
+
+        Args:
+            language: ISO code like "it" or "en". If None, the model will try to detect language.
+            beam_size: Decoding beams (1 = greedy, faster).
+            step_s: Interval between incremental decoding passes.
+            **capture_kwargs: Forwarded to capture_utterance (silence_ms, start_timeout, ...).
+
+        Returns:
+            (audio, text): the int16 samples of the utterance and its transcript.
+            self.last_timings gets record_s (capture) and transcribe_s (decoding
+            left after end-of-speech).
+        """
+        streamer = StreamingTranscriber(self, language=language, beam_size=beam_size)
+        stop = threading.Event()
+
+        def decode_loop():
+            while not stop.wait(step_s):
+                streamer.process()
+
+        worker = threading.Thread(target=decode_loop, name="stt-stream", daemon=True)
+        worker.start()
+        t0 = time.perf_counter()
+        try:
+            audio = self.capture_utterance(on_audio=streamer.insert_audio, **capture_kwargs)
+        finally:
+            stop.set()
+            worker.join()
+        t1 = time.perf_counter()
+        text = streamer.finish() if audio.size else ""
+        self.last_timings = {"record_s": t1 - t0, "transcribe_s": time.perf_counter() - t1}
+        return audio, text
+
+    def persist(self, audio: np.ndarray) -> Optional[Future]:
+        """
+        Archives an utterance as WAV in the background (if persist_audio is enabled).
+
+        Returns:
+            A Future resolving to the WAV path, or None when nothing is written.
+        """
+        if not self.persist_audio or audio.size == 0:
+            return None
+        return self._writer.submit(self.save_wav, audio)
+
+    def record_utterance(self, **kwargs) -> str:
+        """
+        Records one utterance with capture_utterance() and saves it as 16-bit PCM WAV.
+
+        Args:
+            **kwargs: Forwarded to capture_utterance (silence_ms, start_timeout, ...).
+
+        Returns:
+            Path to the saved WAV file (string).
+        """
+        return self.save_wav(self.capture_utterance(**kwargs))
+
     # ---------------------------
     # Transcription
     # ---------------------------
@@ -149,14 +476,425 @@ class SpeechToText:
         Returns:
             The transcribed text (string).
         """
-        segments, info = self.model.transcribe(
-            wav_path,
+        with span("stt.transcribe", mode="file"):
+            key = None
+            if self.cache is not None:
+                key = self._cache_key(Path(wav_path).read_bytes(), "file", language, beam_size, vad_filter)
+                hit = self._cache_get(key)
+                if hit is not None:
+                    return hit["text"]
+
+            segments, info = self.model.transcribe(
+                wav_path,
+                language=language,
+                vad_filter=vad_filter,
+                beam_size=beam_size,
+            )
+            text = " ".join(seg.text.strip() for seg in segments).strip()
+
+            if key is not None:
+                self.cache.put(key, {"text": text})
+            return text
+
+    def _cache_get(self, key: str) -> Optional[dict]:
+        """
+        TranscriptCache lookup, counted in the stt.transcript_cache metric.
+        """
+        hit = self.cache.get(key)
+        inc("stt.transcript_cache", result="miss" if hit is None else "hit")
+        return hit
+
+    def _cache_key(self, audio: bytes, mode: str, language, beam_size: int, vad_filter: bool) -> str:
+        """
+        TranscriptCache key for this model configuration.
+        """
+        return TranscriptCache.make_key(
+            audio,
+            mode=mode,
+            model_size=self.model_size,
+            compute_type=self.compute_type,
             language=language,
+            beam_size=beam_size,
             vad_filter=vad_filter,
+        )
+
+    def batched_pipeline(self) -> BatchedInferencePipeline:
+        """
+        Returns a BatchedInferencePipeline over the shared model for the calling thread.
+        The pipeline keeps per-call state, so each worker thread gets its own (they
+        are cheap wrappers; the model weights are shared).
+        """
+        pipeline = getattr(self._local, "batched", None)
+        if pipeline is None:
+            pipeline = self._local.batched = BatchedInferencePipeline(model=self.model)
+        return pipeline
+
+    def transcribe_batched(
+        self,
+        audio,
+        language: Optional[str] = None,
+        beam_size: int = 1,
+        batch_size: int = 16,
+    ):
+        """
+        Offline transcription of a long recording with BatchedInferencePipeline:
+        VAD splits the audio into speech chunks that are decoded `batch_size` at a time.
+        Much higher throughput than transcribe() for archives and long files.
+
+        Args:
+            audio: Path to an audio file, or mono float32 samples at 16 kHz.
+            language: ISO code like "it" or "en". If None, the model will try to detect language.
+            beam_size: Decoding beams (1 = greedy, faster).
+            batch_size: Speech chunks decoded per model call.
+
+        Returns:
+            (text, meta): the transcript and a dict with the detected "language"
+                          and the audio "duration" in seconds.
+        """
+        with span("stt.transcribe", mode="batched"):
+            key = None
+            if self.cache is not None:
+                raw = Path(audio).read_bytes() if isinstance(audio, (str, Path)) else np.asarray(audio).tobytes()
+                key = self._cache_key(raw, "batched", language, beam_size, True)
+                hit = self._cache_get(key)
+                if hit is not None:
+                    return hit["text"], hit["meta"]
+
+            segments, info = self.batched_pipeline().transcribe(
+                audio,
+                language=language,
+                beam_size=beam_size,
+                batch_size=batch_size,
+                vad_filter=True,
+            )
+            text = " ".join(seg.text.strip() for seg in segments).strip()
+            meta = {"language": info.language, "duration": info.duration}
+
+            if key is not None:
+                self.cache.put(key, {"text": text, "meta": meta})
+            return text, meta
+
+    def transcribe_array(
+        self,
+        audio: np.ndarray,
+        language: Optional[str] = None,
+        beam_size: int = 1,
+        vad_filter: bool = True,
+    ) -> str:
+        """
+        Offline transcription of audio already in memory (e.g. from capture_utterance).
+        Skips the WAV write/read/decode round-trip of transcribe().
+
+        Args:
+            audio: Mono samples at self.sample_rate, int16 or float32 in [-1, 1].
+            language: ISO code like "it" or "en". If None, the model will try to detect language.
+            beam_size: Decoding beams (1 = greedy, faster; >1 can improve quality slightly).
+            vad_filter: Whether to use Voice Activity Detection to skip silences.
+
+        Returns:
+            The transcribed text (string).
+        """
+        with span("stt.transcribe", mode="array"):
+            if audio.size == 0:
+                return ""
+            key = None
+            if self.cache is not None:
+                key = self._cache_key(
+                    np.ascontiguousarray(audio).tobytes() + f"{audio.dtype}/{self.sample_rate}".encode(),
+                    "array", language, beam_size, vad_filter,
+                )
+                hit = self._cache_get(key)
+                if hit is not None:
+                    return hit["text"]
+
+            segments, info = self.model.transcribe(
+                self.to_whisper_input(audio),
+                language=language,
+                vad_filter=vad_filter,
+                beam_size=beam_size,
+            )
+            text = " ".join(seg.text.strip() for seg in segments).strip()
+
+            if key is not None:
+                self.cache.put(key, {"text": text})
+            return text
+
+    def transcribe_many(
+        self,
+        clips: List[np.ndarray],
+        language: Optional[str] = None,
+        beam_size: int = 1,
+        vad_filter: bool = True,
+    ) -> List[str]:
+        """
+        Transcribe several short utterances (e.g. from different sessions) together:
+        their log-mel features are stacked, the encoder runs once on the batch and
+        CTranslate2 decodes all of them in a single generate() call.
+
+        Unlike BatchedInferencePipeline, clips are never merged: each one is a row
+        of the batch and gets its own transcript. With vad_filter each clip first
+        goes through the same Silero VAD pass as transcribe_array(), so a clip gets
+        the same input whether it is batched or not. Rows Whisper marks as
+        no-speech and decodes with a low average log-probability are returned
+        empty. Clips longer than 30 s do not fit one window and fall back to
+        transcribe_array().
+
+        Args:
+            clips: Mono samples at self.sample_rate, int16 or float32 in [-1, 1].
+            language: ISO code like "it" or "en". If None, detected per clip.
+            beam_size: Decoding beams (1 = greedy, faster).
+            vad_filter: Whether to use Voice Activity Detection to skip silences.
+
+        Returns:
+            The transcripts, in the order of `clips`.
+        """
+        texts: List[Optional[str]] = [None] * len(clips)
+        keys: List[Optional[str]] = [None] * len(clips)
+        pending = []
+        for i, clip in enumerate(clips):
+            if clip.size == 0:
+                texts[i] = ""
+                continue
+            if self.cache is not None:
+                keys[i] = self._cache_key(
+                    np.ascontiguousarray(clip).tobytes() + f"{clip.dtype}/{self.sample_rate}".encode(),
+                    "many", language, beam_size, vad_filter,
+                )
+                hit = self._cache_get(keys[i])
+                if hit is not None:
+                    texts[i] = hit["text"]
+                    continue
+            audio = self.to_whisper_input(clip)
+            if vad_filter:
+                # what WhisperModel.transcribe(vad_filter=True) does before decoding
+                chunks, _ = collect_chunks(audio, get_speech_timestamps(audio, VadOptions()))
+                audio = np.concatenate(chunks)
+                if audio.size == 0:
+                    texts[i] = ""
+                    continue
+            if audio.size > self.model.feature_extractor.n_samples:
+                texts[i] = self.transcribe_array(clip, language=language, beam_size=beam_size, vad_filter=vad_filter)
+                continue
+            pending.append((i, audio))
+
+        if pending:
+            with span("stt.transcribe", mode="many"):
+                inc("stt.batched_clips", len(pending))
+                decoded = self._decode_batch([audio for _, audio in pending], language, beam_size)
+            for (i, _), text in zip(pending, decoded):
+                texts[i] = text
+                if keys[i] is not None:
+                    self.cache.put(keys[i], {"text": text})
+        return texts
+
+    def _decode_batch(self, audios: List[np.ndarray], language: Optional[str], beam_size: int) -> List[str]:
+        """
+        One encoder pass and one generate() call for up to 30 s clips at 16 kHz.
+        """
+        model = self.model
+        features = np.stack([
+            pad_or_trim(model.feature_extractor(audio)[..., :-1]) for audio in audios
+        ])
+        multilingual = model.model.is_multilingual
+        tokenizer = Tokenizer(
+            model.hf_tokenizer, multilingual, task="transcribe", language=language or "en"
+        )
+        prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+        encoder_output = model.encode(features)
+
+        prompts = [list(prompt) for _ in audios]
+        if multilingual and language is None:
+            # same as BatchedInferencePipeline: swap in each row's detected language token
+            index = prompt.index(tokenizer.language)
+            for row, langs in zip(prompts, model.model.detect_language(encoder_output)):
+                row[index] = tokenizer.tokenizer.token_to_id(langs[0][0])
+
+        results = model.model.generate(
+            encoder_output,
+            prompts,
             beam_size=beam_size,
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+            return_scores=True,
+            return_no_speech_prob=True,
         )
-        text = " ".join(seg.text.strip() for seg in segments).strip()
-        return text
+        texts = []
+        for result in results:
+            # scores are length-normalized (length_penalty=1); like faster-whisper,
+            # average the cumulative log-probability over the tokens plus EOT
+            seq_len = len(result.sequences_ids[0])
+            avg_logprob = result.scores[0] * seq_len / (seq_len + 1)
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOG_PROB_THRESHOLD:
+                texts.append("")
+                continue
+            tokens = [t for t in result.sequences_ids[0] if t < tokenizer.eot]
+            texts.append(tokenizer.decode(tokens).strip())
+        return texts
+
+    def to_whisper_input(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Converts mono samples to what Whisper expects: float32 in [-1, 1] at 16 kHz.
+        """
+        audio = np.asarray(audio).ravel()
+        if audio.dtype == np.int16:
+            audio = audio.astype(np.float32) / 32768.0
+        else:
+            audio = audio.astype(np.float32, copy=False)
+        if self.sample_rate != WHISPER_SAMPLE_RATE and audio.size:
+            # linear resampling is enough for speech recognition
+            n_out = int(round(audio.size * WHISPER_SAMPLE_RATE / self.sample_rate))
+            positions = np.linspace(0, audio.size - 1, n_out)
+            audio = np.interp(positions, np.arange(audio.size), audio).astype(np.float32)
+        return audio
+
+
+class StreamingTranscriber:
+    """
+    Incremental Whisper transcription of audio that is still being captured.
+
+    Each process() call decodes the not-yet-committed audio buffer with word
+    timestamps. Words on which two consecutive hypotheses agree (longest common
+    prefix, "local agreement") are committed and never revised; the rest stays
+    tentative. Committed audio is dropped from the buffer once it grows past
+    `trim_s`, so every pass decodes a bounded window.
+
+    Typical usage:
+        streamer = StreamingTranscriber(stt, language="en")
+        for chunk in chunks:
+            streamer.insert_audio(chunk)
+            streamer.process()           # returns the committed text so far
+        text = streamer.finish()         # decodes the tail and commits everything
+    """
+
+    def __init__(
+        self,
+        stt: "SpeechToText",
+        language: Optional[str] = None,
+        beam_size: int = 1,
+        min_chunk_s: float = 0.5,
+        trim_s: float = 10.0,
+    ):
+        """
+        Args:
+            stt: SpeechToText providing the Whisper model and sample rate.
+            language: ISO code like "it" or "en"; None = auto-detect on each pass.
+            beam_size: Decoding beams (1 = greedy, faster).
+            min_chunk_s: Skip a pass if less than this much new audio arrived.
+            trim_s: Drop committed audio from the buffer when it exceeds this length.
+        """
+        self.stt = stt
+        self.language = language
+        self.beam_size = beam_size
+        self.min_chunk_s = min_chunk_s
+        self.trim_s = trim_s
+        self._lock = threading.Lock()
+        self._buffer = np.zeros(0, dtype=np.float32)   # 16 kHz float32, starts at _offset
+        self._offset = 0.0                             # seconds from utterance start
+        self._decoded_until = 0.0                      # buffer length at the last pass
+        self.committed: List[Tuple[float, float, str]] = []
+        self._tentative: List[Tuple[float, float, str]] = []
+
+    @property
+    def text(self) -> str:
+        """
+        Committed transcript so far.
+        """
+        return "".join(word for _, _, word in self.committed).strip()
+
+    def insert_audio(self, audio: np.ndarray):
+        """
+        Append captured audio (int16 or float32 at stt.sample_rate).
+        """
+        chunk = self.stt.to_whisper_input(audio)
+        with self._lock:
+            self._buffer = np.concatenate([self._buffer, chunk])
+
+    def process(self) -> str:
+        """
+        Run one decoding pass and commit the words two passes agree on.
+
+        Returns:
+            The committed transcript so far.
+        """
+        with self._lock:
+            buffer, offset = self._buffer, self._offset
+        if (buffer.size / WHISPER_SAMPLE_RATE) - self._decoded_until < self.min_chunk_s:
+            return self.text
+        self._decoded_until = buffer.size / WHISPER_SAMPLE_RATE
+
+        hypothesis = self._decode(buffer, offset)
+        agreed = 0
+        for old, new in zip(self._tentative, hypothesis):
+            if _normalize_word(old[2]) != _normalize_word(new[2]):
+                break
+            agreed += 1
+        self.committed.extend(hypothesis[:agreed])
+        self._tentative = hypothesis[agreed:]
+
+        if self.committed and buffer.size / WHISPER_SAMPLE_RATE > self.trim_s:
+            self._trim(self.committed[-1][1])
+        return self.text
+
+    def finish(self) -> str:
+        """
+        Decode the remaining buffer and commit everything (end of speech).
+
+        Returns:
+            The final transcript.
+        """
+        with self._lock:
+            buffer, offset = self._buffer, self._offset
+        if buffer.size:
+            self.committed.extend(self._decode(buffer, offset))
+        self._tentative = []
+        return self.text
+
+    def _decode(self, buffer: np.ndarray, offset: float) -> List[Tuple[float, float, str]]:
+        """
+        Transcribe the buffer and return the words after the last committed one,
+        with absolute (utterance-relative) timestamps.
+        """
+        last_end = self.committed[-1][1] if self.committed else 0.0
+        # Only committed words whose audio was already trimmed away are context:
+        # words still in the buffer would appear both in the prompt and in the
+        # audio, and Whisper tends to drop or shift them (as in whisper_streaming).
+        prompt = "".join(word for _, end, word in self.committed if end <= offset + 0.01).strip()
+        segments, _ = self.stt.model.transcribe(
+            buffer,
+            language=self.language,
+            beam_size=self.beam_size,
+            vad_filter=False,            # the recorder already end-points speech
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            initial_prompt=prompt[-200:] or None,
+        )
+        words = []
+        for seg in segments:
+            for w in seg.words or []:
+                start, end = offset + w.start, offset + w.end
+                if end > last_end + 0.01:
+                    words.append((start, end, w.word))
+        return words
+
+    def _trim(self, until: float):
+        """
+        Drop buffered audio before `until` (seconds from utterance start).
+        """
+        with self._lock:
+            cut = int((until - self._offset) * WHISPER_SAMPLE_RATE)
+            if cut <= 0:
+                return
+            self._buffer = self._buffer[cut:]
+            self._offset = until
+        self._decoded_until = max(0.0, self._decoded_until - cut / WHISPER_SAMPLE_RATE)
+
+
+def _normalize_word(word: str) -> str:
+    """
+    Compare words ignoring case, spacing and punctuation.
+    """
+    return "".join(ch for ch in word.lower() if ch.isalnum())
 
 
 # ---------------------------
@@ -172,7 +910,8 @@ if __name__ == "__main__":
     print("Available input devices:")
     print("\n".join(SpeechToText.list_input_devices()))
     stt = SpeechToText(model_size="small", sample_rate=16000, audio_dir="data/audio_raw")
-    wav = stt.record_wav(seconds=6)
-    text = stt.transcribe(wav, language="en")  # set None for auto-detect
+    audio = stt.capture_utterance()
+    stt.persist(audio)
+    text = stt.transcribe_array(audio, language="en")  # set None for auto-detect
     print("\n[TRANSCRIPT]")
     print(text or "(empty)")
@@ -0,0 +1,120 @@
+"""
+synthesis_pool.py
+
+Pool of persistent Piper synthesis workers for concurrent TTS.
+
+A single Piper voice synthesizes one sentence at a time; with several sessions
+talking at once their sentences queue behind each other. SynthesisPool runs N
+worker threads fed from one work queue:
+
+- Each worker owns its synthesis function for its whole life: with the onnx
+  backend, its own Piper voice and onnxruntime InferenceSession (sessions are
+  never shared, so piper-onnx needs no locking); with the exe backend, each
+  worker runs its own piper.exe subprocess per sentence
+- Jobs are served in arrival order by whichever worker is free, so concurrent
+  replies are synthesized in parallel across cores
+- Metrics: tts.pool_wait histogram (time queued before a worker picked the job),
+  tts.pool_busy gauge (workers currently synthesizing)
+
+Usage:
+    pool = SynthesisPool([voice_a.synthesize, voice_b.synthesize])
+    pcm = pool.synthesize("Hello there.")        # blocks, thread-safe
+    future = pool.submit("How are you?")         # or non-blocking
+    pool.close()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+from metrics import observe, set_gauge
+
+# Sentinel used to stop the worker threads.
+_STOP = object()
+
+
+class SynthesisPool:
+    """
+    N worker threads, each bound to one synthesis function, sharing a FIFO of jobs.
+    """
+
+    def __init__(self, synthesizers: Sequence[Callable[[str], np.ndarray]], name: str = "tts-worker"):
+        """
+        Args:
+            synthesizers: One function per worker, text -> int16 PCM. Each is only
+                          ever called from its own worker thread.
+            name: Prefix of the worker thread names.
+        """
+        if not synthesizers:
+            raise ValueError("SynthesisPool needs at least one synthesizer")
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = [
+            threading.Thread(target=self._work_loop, args=(fn,), name=f"{name}-{i}", daemon=True)
+            for i, fn in enumerate(synthesizers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a sentence; the Future resolves to its int16 PCM.
+        """
+        future: Future = Future()
+        self._jobs.put((text, future, time.perf_counter()))
+        return future
+
+    def synthesize(self, text: str) -> np.ndarray:
+        """
+        Blocking synthesis on the first free worker.
+        """
+        return self.submit(text).result()
+
+    async def synthesize_async(self, text: str) -> np.ndarray:
+        """
+        Same as synthesize without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(text))
+
+    def close(self):
+        """
+        Let the workers finish the queued jobs, then stop them.
+        """
+        for _ in self._workers:
+            self._jobs.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+
+    def _set_busy(self, delta: int):
+        with self._lock:
+            self._busy += delta
+            set_gauge("tts.pool_busy", self._busy)
+
+    def _work_loop(self, synthesize: Callable[[str], np.ndarray]):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            text, future, enqueued = job
+            if not future.set_running_or_notify_cancel():
+                continue  # cancelled while queued (e.g. barge-in)
+            observe("tts.pool_wait", time.perf_counter() - enqueued)
+            self._set_busy(+1)
+            try:
+                future.set_result(synthesize(text))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self._set_busy(-1)
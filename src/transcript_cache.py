@@ -0,0 +1,123 @@
+"""
+transcript_cache.py
+
+On-disk cache of transcriptions for the Coach AI project.
+
+Entries live in a small SQLite database and are keyed by a SHA-256 of the
+audio bytes plus every setting that changes the output (model size, compute
+type, language, beam size, VAD, mode). Re-transcribing an unchanged recording
+is a single indexed lookup instead of a Whisper decode.
+
+The database is bounded in size: when it grows past max_bytes, the least
+recently used entries are evicted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_lru ON transcripts(last_access);
+"""
+
+
+class TranscriptCache:
+    """
+    SQLite-backed, size-bounded LRU cache of transcription results.
+
+    Typical usage:
+        cache = TranscriptCache("data/cache/transcripts.sqlite", max_bytes=64 * 2**20)
+        key = cache.make_key(audio_bytes, model_size="small", language="en")
+        hit = cache.get(key)
+        if hit is None:
+            cache.put(key, {"text": text})
+
+    Safe to share between threads (one connection guarded by a lock).
+    """
+
+    def __init__(self, path: str = "data/cache/transcripts.sqlite", max_bytes: int = 64 * 2**20):
+        """
+        Args:
+            path: SQLite database file (created if missing).
+            max_bytes: Upper bound for the stored values; LRU entries beyond it are evicted.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(audio: bytes, **params) -> str:
+        """
+        Cache key: hash of the audio content plus the transcription settings.
+
+        Args:
+            audio: Raw audio bytes (file content or PCM buffer).
+            **params: Settings that affect the transcript (model_size, compute_type, language, ...).
+        """
+        digest = hashlib.sha256(audio)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns the cached value (and marks it as recently used), or None.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        """
+        Stores a value, then evicts least recently used entries above max_bytes.
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload.encode("utf-8")), time.time()),
+            )
+            self._evict()
+            self._db.commit()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM transcripts ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._db.close()
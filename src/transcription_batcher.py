@@ -0,0 +1,159 @@
+"""
+transcription_batcher.py
+
+Dynamic micro-batching of Whisper transcriptions across concurrent sessions.
+
+With many users each utterance used to run the encoder alone. TranscriptionBatcher
+queues the utterances submitted by all sessions and hands them to
+SpeechToText.transcribe_many in batches:
+
+- A batch is dispatched as soon as it has `max_batch_size` clips, or when its
+  oldest clip has waited `max_wait_ms` (a bounded delay, typically 20-50 ms)
+- Only clips with the same language, beam size and vad_filter are batched together;
+  with vad_filter (the default) each clip gets the same Silero VAD pass as
+  SpeechToText.transcribe_array, so a transcript does not depend on batching
+- `workers` batches can run at once (the model runs concurrent calls when
+  SpeechToText was created with num_workers >= workers)
+- Metrics: stt.batch_wait histogram (time spent queued), stt.batches counter
+  by batch size
+
+Usage:
+    batcher = TranscriptionBatcher(stt, max_batch_size=8, max_wait_ms=30)
+    text = batcher.transcribe(audio, language="en")   # blocks, thread-safe
+    ...
+    batcher.close()
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+from metrics import inc, observe
+
+if TYPE_CHECKING:
+    from stt import SpeechToText
+
+# Sentinel used to stop the collector thread.
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("audio", "language", "beam_size", "vad_filter", "future", "enqueued")
+
+    def __init__(self, audio: np.ndarray, language: Optional[str], beam_size: int, vad_filter: bool):
+        self.audio = audio
+        self.language = language
+        self.beam_size = beam_size
+        self.vad_filter = vad_filter
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+    @property
+    def group(self):
+        return self.language, self.beam_size, self.vad_filter
+
+
+class TranscriptionBatcher:
+    """
+    Thread-safe front end to SpeechToText that groups concurrent transcriptions.
+    """
+
+    def __init__(self, stt: SpeechToText, max_batch_size: int = 8, max_wait_ms: float = 30.0, workers: int = 1):
+        """
+        Args:
+            stt: Shared SpeechToText (its model and transcript cache are used).
+            max_batch_size: Clips per model call.
+            max_wait_ms: Longest time the first clip of a batch waits for company.
+            workers: Batches decoded concurrently.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.stt = stt
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait_s = float(max_wait_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="stt-batch")
+        self._collector = threading.Thread(target=self._collect_loop, name="stt-batcher", daemon=True)
+        self._collector.start()
+
+    def submit(
+        self, audio: np.ndarray, language: Optional[str] = None, beam_size: int = 1, vad_filter: bool = True
+    ) -> Future:
+        """
+        Queue one utterance. The Future resolves to its transcript.
+        """
+        request = _Request(audio, language, beam_size, vad_filter)
+        self._queue.put(request)
+        return request.future
+
+    def transcribe(
+        self, audio: np.ndarray, language: Optional[str] = None, beam_size: int = 1, vad_filter: bool = True
+    ) -> str:
+        """
+        Drop-in for SpeechToText.transcribe_array: blocks until this clip's batch is done.
+        """
+        return self.submit(audio, language=language, beam_size=beam_size, vad_filter=vad_filter).result()
+
+    def close(self):
+        """
+        Finish the queued clips and stop the worker threads.
+        """
+        self._queue.put(_STOP)
+        self._collector.join()
+        self._pool.shutdown(wait=True)
+
+    def _collect_loop(self):
+        # Clips that arrived while a batch was being collected for another group
+        carry: List[_Request] = []
+        stopping = False
+        while not stopping or carry:
+            if carry:
+                first = carry.pop(0)
+            else:
+                first = self._queue.get()
+                if first is _STOP:
+                    return
+            batch = [first]
+            deadline = first.enqueued + self.max_wait_s
+            # carried-over clips of the same group join first (they are older)
+            for request in [r for r in carry if r.group == first.group][: self.max_batch_size - 1]:
+                carry.remove(request)
+                batch.append(request)
+            while len(batch) < self.max_batch_size and not stopping:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                elif request.group == first.group:
+                    batch.append(request)
+                else:
+                    carry.append(request)
+            self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[_Request]):
+        start = time.perf_counter()
+        for request in batch:
+            observe("stt.batch_wait", start - request.enqueued)
+        inc("stt.batches", size=len(batch))
+        language, beam_size, vad_filter = batch[0].group
+        try:
+            texts = self.stt.transcribe_many(
+                [r.audio for r in batch], language=language, beam_size=beam_size, vad_filter=vad_filter
+            )
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, text in zip(batch, texts):
+            request.future.set_result(text)
@@ -1,67 +1,360 @@
 # src/tts.py
 from __future__ import annotations
-import os, subprocess, tempfile, platform
+import os, subprocess, tempfile, platform, wave, json, shutil, asyncio, threading
+from typing import Optional
+
+import numpy as np
+
+from metrics import inc, span
+from phrase_cache import PhraseCache
+from synthesis_pool import SynthesisPool
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # PortAudio mancante: si usa il player di sistema
+    sd = None
+
+BACKENDS = ("auto", "onnx", "exe")
+
+# Blocchi scritti sullo stream: interrupt() ferma l'audio entro un blocco (~100 ms)
+PLAY_CHUNK_S = 0.1
+
 
 class TextToSpeech:
-    def __init__(self, piper_dir: str, model_name: str = "en_US-amy-medium"):
+    def __init__(
+        self,
+        piper_dir: str,
+        model_name: str = "en_US-amy-medium",
+        model_path: Optional[str] = None,
+        config_path: Optional[str] = None,
+        use_cuda: bool = False,
+        backend: str = "auto",
+        in_memory: bool = True,
+        cache: Optional[PhraseCache] = None,
+        workers: int = 1,
+    ):
+        """
+        backend:
+            "onnx" -> sintesi in-process (piper-onnx + onnxruntime), la voce viene caricata una sola volta
+            "exe"  -> lancia piper.exe per ogni frase (solo Windows)
+            "auto" -> "onnx" se piper-onnx e' installato, altrimenti "exe"
+        in_memory:
+            True -> l'audio resta un buffer NumPy int16 e viene scritto su un OutputStream
+                    sounddevice aperto una volta e riusato tra i turni
+                    (nessun file temporaneo, nessun processo player)
+            False -> WAV temporaneo riprodotto da aplay/paplay/ffplay/afplay/SoundPlayer
+        cache:
+            PhraseCache opzionale: le frasi gia' sintetizzate (stessa voce, stesso testo
+            normalizzato, stessi parametri) vengono riprodotte senza rifare la sintesi.
+        workers:
+            >1 -> SynthesisPool di N worker persistenti (uno per sessione onnx, con i thread
+                  della CPU divisi tra loro, o un piper.exe per volta ciascuno): frasi di
+                  risposte diverse vengono sintetizzate in parallelo invece che in coda.
+        Il player viene scelto una sola volta qui e poi riusato (vedi self.player).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend TTS sconosciuto: {backend} (validi: {', '.join(BACKENDS)})")
         self.piper_dir = os.path.abspath(piper_dir)
         self.exe = os.path.join(self.piper_dir, "piper.exe")
-        self.model = os.path.join(self.piper_dir, f"{model_name}.onnx")
-        self.config = os.path.join(self.piper_dir, f"{model_name}.onnx.json")
-        if not os.path.isfile(self.exe):
-            raise FileNotFoundError(f"piper.exe non trovato in {self.piper_dir}")
+        self.model = os.path.abspath(model_path) if model_path else os.path.join(self.piper_dir, f"{model_name}.onnx")
+        self.config = os.path.abspath(config_path) if config_path else f"{self.model}.json"
+        self.use_cuda = bool(use_cuda)
+        self.in_memory = bool(in_memory)
+        self.cache = cache
         for p in [self.model, self.config]:
             if not os.path.isfile(p):
                 raise FileNotFoundError(f"Voce non trovata: {p}")
+        with open(self.config, "r", encoding="utf-8") as f:
+            self.sample_rate = int(json.load(f)["audio"]["sample_rate"])
+
+        self.workers = max(1, int(workers))
+        # con piu' sessioni onnx ognuna usa una parte dei core, per non sovrascriverle
+        threads = max(1, (os.cpu_count() or 1) // self.workers) if self.workers > 1 else 0
+        self._voice = None
+        if backend in ("auto", "onnx"):
+            try:
+                self._voice = self._load_onnx_voice(threads)
+                backend = "onnx"
+            except ImportError:
+                if backend == "onnx":
+                    raise
+                backend = "exe"
+        if backend == "exe" and not os.path.isfile(self.exe):
+            raise FileNotFoundError(f"piper.exe non trovato in {self.piper_dir}")
+        self.backend = backend
+
+        self._pool = None
+        if self.workers > 1:
+            if backend == "onnx":
+                voices = [self._voice] + [self._load_onnx_voice(threads) for _ in range(self.workers - 1)]
+                synthesizers = [lambda text, voice=voice: self._synthesize_onnx(text, voice) for voice in voices]
+            else:
+                synthesizers = [self._synthesize_exe] * self.workers
+            self._pool = SynthesisPool(synthesizers)
+
+        self._stream = None
+        self.player, self._player_cmd = self._discover_player()
+        self._interrupted = threading.Event()
+        self._player_proc = None
+
+    def _load_onnx_voice(self, intra_op_threads: int = 0):
+        """Crea una InferenceSession persistente e la voce Piper che la usa (0 thread = default di onnxruntime)."""
+        import onnxruntime as ort
+        from piper_onnx import Piper
+
+        providers = ["CPUExecutionProvider"]
+        if self.use_cuda and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        session = ort.InferenceSession(
+            self.model,
+            sess_options=options,
+            providers=providers,
+        )
+        return Piper.from_session(session, self.config)
+
+    def warmup(self):
+        """Sintetizza una parola (senza riprodurla) per inizializzare sessione/cache."""
+        self.synthesize("Hello.")
 
     def speak(self, text: str):
         if not text:
             return
-        # scrivo testo su file per passarlo via STDIN (compatibile con tutte le build)
-        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as tf:
-            tf.write(text.strip())
-            txt_path = tf.name
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as wf:
-            wav_path = wf.name
-
-        cmd = [
+        with span("tts.speak"):
+            self.play(self.synthesize(text))
+
+    def synthesize(self, text: str) -> np.ndarray:
+        """Sintetizza `text` con Piper e ritorna il PCM int16 mono (a self.sample_rate), tutto in memoria."""
+        with span("tts.synthesize", backend=self.backend):
+            key, pcm = self._cache_lookup(text)
+            if pcm is not None:
+                return pcm
+            if self._pool is not None:
+                pcm = self._pool.synthesize(text)
+            elif self.backend == "onnx":
+                pcm = self._synthesize_onnx(text)
+            else:
+                pcm = self._synthesize_exe(text)
+            if key is not None:
+                self.cache.put(key, pcm)
+            return pcm
+
+    async def synthesize_async(self, text: str) -> np.ndarray:
+        """
+        Come `synthesize`, senza bloccare l'event loop: piper.exe gira come subprocess
+        asyncio, la sessione onnx in un thread.
+        """
+        with span("tts.synthesize", backend=self.backend):
+            key, pcm = self._cache_lookup(text)
+            if pcm is not None:
+                return pcm
+            if self._pool is not None:
+                pcm = await self._pool.synthesize_async(text)
+            elif self.backend == "onnx":
+                pcm = await asyncio.to_thread(self._synthesize_onnx, text)
+            else:
+                proc = await asyncio.create_subprocess_exec(
+                    *self._exe_cmd(),
+                    cwd=self.piper_dir,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    stdout, stderr = await proc.communicate(text.strip().encode("utf-8"))
+                except asyncio.CancelledError:
+                    proc.kill()  # sintesi annullata (barge-in): niente processi orfani
+                    raise
+                pcm = self._exe_output(proc.returncode, stdout, stderr)
+            if key is not None:
+                self.cache.put(key, pcm)
+            return pcm
+
+    def _cache_lookup(self, text: str):
+        """Ritorna (chiave, pcm in cache o None); chiave None se la cache e' disattivata."""
+        if self.cache is None:
+            return None, None
+        key = PhraseCache.make_key(self.model, text, **self.synthesis_params())
+        pcm = self.cache.get(key)
+        inc("tts.phrase_cache", result="miss" if pcm is None else "hit")
+        return key, pcm
+
+    def synthesis_params(self) -> dict:
+        """Parametri che cambiano l'audio prodotto (parte della chiave di cache)."""
+        params = {"backend": self.backend, "sample_rate": self.sample_rate}
+        if self.backend == "exe":
+            params["sentence_silence"] = 0.4
+        return params
+
+    def _synthesize_onnx(self, text: str, voice=None) -> np.ndarray:
+        samples, _ = (voice or self._voice).create(text.strip())
+        return _float_to_int16(samples)
+
+    def _exe_cmd(self) -> list:
+        # testo via STDIN in UTF-8 (bytes, quindi nessun problema di codepage) e PCM raw su STDOUT
+        return [
             self.exe, "-m", self.model, "-c", self.config,
             "--sentence_silence", "0.4",
-            "-f", wav_path
+            "--output_raw"
         ]
+
+    @staticmethod
+    def _exe_output(returncode: int, stdout: bytes, stderr: bytes) -> np.ndarray:
+        if returncode != 0 or not stdout:
+            stderr = stderr.decode("utf-8", errors="replace")
+            raise RuntimeError(
+                f"Piper fallito (code={returncode}).\nSTDERR:\n{stderr}"
+            )
+        return np.frombuffer(stdout, dtype=np.int16)
+
+    def _synthesize_exe(self, text: str) -> np.ndarray:
         completed = subprocess.run(
-            cmd,
+            self._exe_cmd(),
             cwd=self.piper_dir,                 # IMPORTANT: carica le DLL giuste
-            stdin=open(txt_path, "r", encoding="utf-8"),
+            input=text.strip().encode("utf-8"),
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
             shell=False
         )
-        os.unlink(txt_path)
+        return self._exe_output(completed.returncode, completed.stdout, completed.stderr)
 
-        if completed.returncode != 0 or not os.path.isfile(wav_path):
-            raise RuntimeError(
-                f"Piper fallito (code={completed.returncode}).\nSTDERR:\n{completed.stderr}"
+    def play(self, audio: np.ndarray):
+        """
+        Riproduce il PCM prodotto da `synthesize` con il player scelto all'avvio.
+        Si puo' fermare da un altro thread con `interrupt()`; dopo un interrupt non
+        suona nulla finche' non si chiama `resume()`.
+        """
+        with span("tts.play", player=self.player or "none"):
+            if self._interrupted.is_set():
+                return
+            if self.player == "stream":
+                # direttamente dal buffer NumPy sullo stream gia' aperto: latenza di avvio ~0
+                frames = np.ascontiguousarray(audio, dtype=np.int16).reshape(-1, 1)
+                chunk = int(self.sample_rate * PLAY_CHUNK_S)
+                for start in range(0, len(frames), chunk):
+                    if self._interrupted.is_set():
+                        # scarta anche l'audio gia' nel buffer del device
+                        self._stream.abort()
+                        self._stream.start()
+                        return
+                    self._stream.write(frames[start:start + chunk])
+                return
+            # fallback: WAV temporaneo + player di sistema
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tf:
+                wav_path = tf.name
+            self.save_wav(audio, wav_path)
+            if self._play_wav(wav_path):
+                os.remove(wav_path)
+
+    def resume(self):
+        """
+        Riabilita la riproduzione dopo `interrupt()`. Va chiamato una volta all'inizio
+        di ogni turno, non in `play`: un interrupt arrivato mentre `play` aspetta il suo
+        thread verrebbe cancellato e la frase suonerebbe sopra l'utente.
+        """
+        self._interrupted.clear()
+
+    def interrupt(self):
+        """Ferma la riproduzione in corso e quelle successive, fino a `resume()` (barge-in)."""
+        self._interrupted.set()
+        proc = self._player_proc
+        if proc is not None and proc.returncode is None:
+            proc.kill()
+
+    async def play_async(self, audio: np.ndarray):
+        """
+        Come `play`, senza bloccare l'event loop: la scrittura sullo stream gira in un
+        thread, il player di sistema come subprocess asyncio.
+        """
+        if self.player == "stream" or self._player_cmd is None:
+            await asyncio.to_thread(self.play, audio)  # gia' misurato da play()
+            return
+        if self._interrupted.is_set():
+            return
+        with span("tts.play", player=self.player):
+            await self._play_wav_async(audio)
+
+    async def _play_wav_async(self, audio: np.ndarray):
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tf:
+            wav_path = tf.name
+        self.save_wav(audio, wav_path)
+        try:
+            cmd = [part.format(wav=wav_path) for part in self._player_cmd]
+            proc = self._player_proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
             )
+            try:
+                _, stderr = await proc.communicate()
+            except asyncio.CancelledError:
+                proc.kill()
+                raise
+            if proc.returncode != 0 and not self._interrupted.is_set():
+                stderr = stderr.decode("utf-8", errors="replace")
+                raise RuntimeError(f"{self.player} fallito (code={proc.returncode}).\nSTDERR:\n{stderr}")
+        finally:
+            self._player_proc = None
+            os.remove(wav_path)
 
-        self._play_wav(wav_path)
-        os.remove(wav_path)
+    def save_wav(self, audio: np.ndarray, wav_path: str):
+        """Scrive il PCM int16 in un file WAV mono."""
+        with wave.open(wav_path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)  # 16-bit PCM
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(audio.tobytes())
+
+    def close(self):
+        """Chiude l'OutputStream persistente (se aperto) e i worker di sintesi."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _discover_player(self):
+        """
+        Sceglie il backend di riproduzione una volta sola.
+        Ritorna (nome, comando) dove comando e' None per lo stream in-process.
+        """
+        if self.in_memory and sd is not None:
+            try:
+                self._stream = sd.OutputStream(samplerate=self.sample_rate, channels=1, dtype="int16")
+                self._stream.start()
+                return "stream", None
+            except Exception as e:
+                self._stream = None
+                print(f"[TTS] OutputStream non disponibile ({e}), uso un player di sistema")
 
-    @staticmethod
-    def _play_wav(wav_path: str):
         system = platform.system()
         if system == "Windows":
-            subprocess.run(["powershell", "-c",
-                            f"(New-Object Media.SoundPlayer '{wav_path}').PlaySync();"])
+            candidates = [["powershell", "-c", "(New-Object Media.SoundPlayer '{wav}').PlaySync();"]]
         elif system == "Darwin":
-            subprocess.run(["afplay", wav_path])
+            candidates = [["afplay", "{wav}"]]
         else:
-            for player in (["aplay", wav_path], ["paplay", wav_path], ["ffplay", "-autoexit", "-nodisp", wav_path]):
-                try:
-                    subprocess.run(player, check=True,
-                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    return
-                except Exception:
-                    continue
+            candidates = [["aplay", "{wav}"], ["paplay", "{wav}"], ["ffplay", "-autoexit", "-nodisp", "{wav}"]]
+        for cmd in candidates:
+            if shutil.which(cmd[0]):
+                return cmd[0], cmd
+        return None, None
+
+    def _play_wav(self, wav_path: str) -> bool:
+        """Riproduce un WAV con il player di sistema in cache. Ritorna False se non c'e' un player."""
+        if self._player_cmd is None:
             print(f"WAV creato in: {wav_path} (nessun player disponibile)")
+            return False
+        cmd = [part.format(wav=wav_path) for part in self._player_cmd]
+        completed = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if completed.returncode != 0:
+            stderr = completed.stderr.decode("utf-8", errors="replace")
+            raise RuntimeError(f"{self.player} fallito (code={completed.returncode}).\nSTDERR:\n{stderr}")
+        return True
+
+
+def _float_to_int16(samples):
+    """Normalizza l'uscita float del modello in PCM int16 (come fa piper)."""
+    peak = max(0.01, float(np.max(np.abs(samples)))) if samples.size else 1.0
+    audio = samples * (32767.0 / peak)
+    return np.clip(audio, -32768, 32767).astype(np.int16)
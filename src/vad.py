@@ -0,0 +1,197 @@
+"""
+vad.py
+
+Energy-based voice activity detection for the Coach AI project.
+This module provides:
+- EnergyVAD: frame-level speech/silence decisions with end-pointing
+- UtteranceCollector: gathers the frames of one utterance (with pre-roll)
+
+Only NumPy is needed, so the recorders in stt.py and the barge-in listener of
+the orchestrator share it without loading the speech recognition stack.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+class EnergyVAD:
+    """
+    Frame-level energy voice activity detector with end-pointing.
+
+    The noise floor is calibrated on the first frames and then follows the
+    frames judged non-speech; a frame counts as speech when its RMS exceeds
+    max(min_threshold, min(max_threshold, noise_floor * noise_factor)).
+    Speech starts after `start_frames` consecutive speech frames and ends after
+    `silence_ms` of trailing silence.
+
+    The calibration uses a low percentile of the frame energies, and frames are
+    classified during calibration too, so a user who starts talking right away
+    is neither mistaken for noise nor made to wait for the calibration.
+
+    Typical usage:
+        vad = EnergyVAD(sample_rate=16000)
+        for frame in frames:             # int16 mono, vad.frame_len samples each
+            event = vad.process(frame)   # "start", "end" or None
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        silence_ms: int = 800,
+        min_threshold: float = 500.0,
+        noise_factor: float = 3.0,
+        calibration_ms: int = 300,
+        start_frames: int = 3,
+        max_threshold: float = 2000.0,
+        floor_adapt: float = 0.05,
+    ):
+        """
+        Args:
+            sample_rate: Sample rate of the incoming frames.
+            frame_ms: Frame length in milliseconds.
+            silence_ms: Trailing silence that ends an utterance.
+            min_threshold: Minimum RMS (int16 scale) considered speech.
+            noise_factor: Speech threshold as a multiple of the calibrated noise floor.
+            calibration_ms: Initial audio used to estimate the noise floor.
+            start_frames: Consecutive speech frames needed to declare speech start.
+            max_threshold: Cap of the noise-derived threshold, about the RMS of a quiet
+                           voice: a floor measured on speech cannot make speech undetectable.
+            floor_adapt: Weight of each non-speech frame in the running noise floor.
+        """
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.frame_ms = frame_ms
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_threshold = float(min_threshold)
+        self.noise_factor = float(noise_factor)
+        self.calibration_frames = max(1, calibration_ms // frame_ms)
+        self.start_frames = max(1, start_frames)
+        self.max_threshold = float(max_threshold)
+        self.floor_adapt = float(floor_adapt)
+        self._noise: List[float] = []
+        self._floor = 0.0
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the current utterance (the noise floor calibration is kept).
+        """
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+
+    # Percentile of the calibration frame energies taken as the noise floor
+    CALIBRATION_PERCENTILE = 10
+
+    @property
+    def noise_floor(self) -> float:
+        return self._floor
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_threshold, min(self.max_threshold, self._floor * self.noise_factor))
+
+    @staticmethod
+    def rms(frame: np.ndarray) -> float:
+        samples = frame.astype(np.float32).ravel()
+        if samples.size == 0:
+            return 0.0
+        if frame.dtype != np.int16:  # float audio in [-1, 1]
+            samples = samples * 32768.0
+        return float(np.sqrt(np.mean(samples * samples)))
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        return self.rms(frame) > self.threshold
+
+    def process(self, frame: np.ndarray) -> Optional[str]:
+        """
+        Feed one frame.
+
+        Returns:
+            "start" when speech begins, "end" when trailing silence closes it, else None.
+        """
+        energy = self.rms(frame)
+        calibrating = len(self._noise) < self.calibration_frames
+        if calibrating:
+            self._noise.append(energy)
+            self._floor = float(np.percentile(self._noise, self.CALIBRATION_PERCENTILE))
+
+        voiced = energy > self.threshold
+        if not voiced and not self.in_speech and not calibrating:
+            # track slow changes of the background (fan, traffic, the coach's own voice)
+            self._floor += self.floor_adapt * (energy - self._floor)
+        if not self.in_speech:
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self.in_speech = True
+                self._silent_run = 0
+                return "start"
+            return None
+
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run >= self.silence_frames:
+            self.in_speech = False
+            self._voiced_run = 0
+            return "end"
+        return None
+
+
+class UtteranceCollector:
+    """
+    Collects the frames of one utterance using an EnergyVAD.
+
+    Keeps a short pre-roll before speech start (so the first syllable is not
+    clipped) and reports completion on trailing silence or on the optional
+    length cap. Shared by the blocking and the asyncio recorders.
+    """
+
+    def __init__(
+        self,
+        vad: EnergyVAD,
+        preroll_ms: int = 300,
+        max_seconds: Optional[float] = None,
+        on_audio: Optional[Callable[[np.ndarray], None]] = None,
+        on_speech_start: Optional[Callable[[], None]] = None,
+    ):
+        self.vad = vad
+        self.on_audio = on_audio
+        self.on_speech_start = on_speech_start
+        self.started = False
+        self._preroll_frames = max(1, preroll_ms // vad.frame_ms)
+        self._max_frames = int(max_seconds * 1000 / vad.frame_ms) if max_seconds else None
+        self._preroll: List[np.ndarray] = []
+        self._captured: List[np.ndarray] = []
+
+    def add(self, frame: np.ndarray) -> bool:
+        """
+        Feed one frame. Returns True when the utterance is complete.
+        """
+        event = self.vad.process(frame)
+        if self.started:
+            self._captured.append(frame)
+            if self.on_audio is not None:
+                self.on_audio(frame)
+            return event == "end" or bool(self._max_frames and len(self._captured) >= self._max_frames)
+        if event == "start":
+            self.started = True
+            if self.on_speech_start is not None:
+                self.on_speech_start()
+            self._captured.extend(self._preroll)
+            self._captured.append(frame)
+            if self.on_audio is not None:
+                self.on_audio(np.concatenate(self._preroll + [frame]))
+        else:
+            self._preroll.append(frame)
+            del self._preroll[:-self._preroll_frames]
+        return False
+
+    def audio(self) -> np.ndarray:
+        """
+        The captured utterance (int16), empty if speech never started.
+        """
+        if not self._captured:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(self._captured)
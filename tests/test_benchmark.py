@@ -0,0 +1,61 @@
+"""
+Smoke test of the latency benchmark (src/benchmark.py): fixed fixtures, one turn
+through CoachEngine.reply against FakeOllamaServer, stub TTS.
+"""
+
+import sys
+import wave
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("ollama")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from benchmark import (  # noqa: E402
+    FIXTURE_DURATIONS, STAGES, StubTextToSpeech, percentile, run_turn, summarize, write_fixtures,
+)
+from coach import CoachEngine  # noqa: E402
+from fake_ollama import DEFAULT_REPLY, FakeOllamaServer  # noqa: E402
+
+
+class CannedTranscriber:
+    """
+    Stands in for SpeechToText: always "hears" the same sentence.
+    """
+
+    def transcribe(self, path, language=None):
+        assert Path(path).exists()
+        return "I feel stuck with my project."
+
+
+def test_fixtures_are_deterministic(tmp_path):
+    first = write_fixtures(tmp_path / "a")
+    second = write_fixtures(tmp_path / "b")
+    assert len(first) == len(FIXTURE_DURATIONS)
+    for a, b, duration in zip(first, second, FIXTURE_DURATIONS):
+        assert a.read_bytes() == b.read_bytes()
+        with wave.open(str(a)) as wf:
+            assert wf.getframerate() == 16000
+            assert wf.getnframes() == int(duration * 16000)
+
+
+def test_turn_against_fake_ollama(tmp_path):
+    wav_path = write_fixtures(tmp_path)[0]
+    with FakeOllamaServer(eval_tokens_per_s=0, prefill_tokens_per_s=0) as fake:
+        coach = CoachEngine({"coach": {"model_name": "fake", "system_prompt": "Be brief.", "host": fake.url}})
+        tts = StubTextToSpeech(rtf=0.0)
+        timings = run_turn(CannedTranscriber(), coach, tts, wav_path, language="en")
+    assert fake.requests == 1
+    assert all(timings[stage] >= 0 for stage in STAGES)
+    assert timings["turn"] >= timings["llm"]
+    assert timings["eval_tokens"] > 0
+    assert len(tts.synthesize(DEFAULT_REPLY)) > 0
+
+
+def test_summary_percentiles():
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == pytest.approx(2.5)
+    summary = summarize({"llm": [0.1, 0.2, 0.3]})
+    assert summary["llm"]["count"] == 3
+    assert summary["llm"]["max"] == pytest.approx(0.3)
@@ -0,0 +1,82 @@
+"""
+ConversationHistory trimming and summary placement (src/coach.py).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("ollama")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from coach import CoachEngine, ConversationHistory  # noqa: E402
+
+# 40 characters = 10 estimated tokens, so one user/assistant turn is 20 tokens
+USER = "u" * 40
+ASSISTANT = "a" * 40
+
+
+def test_no_trim_within_budget():
+    history = ConversationHistory(max_tokens=100, trim_ratio=0.5)
+    for _ in range(5):
+        history.add(USER, ASSISTANT)
+    assert history.total_tokens() == 100
+    assert history.trim() == []
+    assert len(history.turns) == 10
+
+
+def test_trim_goes_down_to_trim_ratio():
+    history = ConversationHistory(max_tokens=100, trim_ratio=0.5)
+    for i in range(6):
+        history.add(f"{i}" + USER[1:], ASSISTANT)
+    dropped = history.trim()
+    # 120 tokens > 100: drop whole turns, oldest first, until <= 50 are left
+    assert history.total_tokens() == 40
+    assert len(dropped) == 8
+    assert [m["role"] for m in dropped] == ["user", "assistant"] * 4
+    assert [m["content"][0] for m in dropped[::2]] == ["0", "1", "2", "3"]
+    assert [m["content"][0] for m in history.turns[::2]] == ["4", "5"]
+    # one trim frees room for several turns: the prefix stays stable meanwhile
+    history.add(USER, ASSISTANT)
+    assert history.trim() == []
+
+
+def test_last_turn_is_kept_even_over_budget():
+    history = ConversationHistory(max_tokens=100, trim_ratio=0.5)
+    history.add(USER, ASSISTANT)
+    history.add("x" * 800, "y" * 800)
+    dropped = history.trim()
+    assert len(dropped) == 2
+    assert history.turns == [{"role": "user", "content": "x" * 800}, {"role": "assistant", "content": "y" * 800}]
+
+
+def test_summary_counts_and_comes_first():
+    history = ConversationHistory(max_tokens=100, trim_ratio=0.5)
+    history.add(USER, ASSISTANT)
+    history.summary = "s" * 40
+    assert history.total_tokens() == 30
+    messages = history.messages()
+    assert messages[0]["role"] == "system"
+    assert messages[0]["content"].endswith("s" * 40)
+    assert messages[1:] == history.turns
+
+
+def test_prompt_order_system_summary_turns_user():
+    coach = CoachEngine({"coach": {"model_name": "fake", "system_prompt": "Be brief."}})
+    history = coach.new_history()
+    history.add(USER, ASSISTANT)
+    history.summary = "The user wants to sleep more."
+    messages = coach._build_messages("Hello", history)
+    assert messages[0] == {"role": "system", "content": "Be brief."}
+    assert messages[1]["role"] == "system" and "sleep more" in messages[1]["content"]
+    assert messages[2:4] == history.turns
+    assert messages[-1] == {"role": "user", "content": "Hello"}
+
+
+def test_clear_forgets_turns_and_summary():
+    history = ConversationHistory()
+    history.add(USER, ASSISTANT)
+    history.summary = "something"
+    history.clear()
+    assert history.messages() == []
@@ -0,0 +1,42 @@
+"""
+Regression checks for EnergyVAD calibration (src/vad.py).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from vad import EnergyVAD  # noqa: E402
+
+RNG = np.random.default_rng(0)
+
+
+def frames(rms: float, count: int, frame_len: int = 480):
+    return [(RNG.standard_normal(frame_len) * rms).astype(np.int16) for _ in range(count)]
+
+
+def test_speech_from_first_frame_is_detected():
+    # the user starts talking right after pressing ENTER: no silence to calibrate on
+    vad = EnergyVAD(sample_rate=16000)
+    events = [vad.process(f) for f in frames(3000, 20)]
+    assert "start" in events
+    assert events.index("start") < vad.calibration_frames
+    assert vad.threshold <= vad.max_threshold
+
+
+def test_speech_after_silence_starts_and_ends():
+    vad = EnergyVAD(sample_rate=16000, silence_ms=300)
+    events = [vad.process(f) for f in frames(100, 20) + frames(3000, 10) + frames(100, 20)]
+    assert events.index("start") >= 20
+    assert "end" in events[events.index("start"):]
+
+
+def test_noise_floor_follows_background():
+    vad = EnergyVAD(sample_rate=16000)
+    for f in frames(100, 10) + frames(400, 200):
+        vad.process(f)
+    assert vad.noise_floor == pytest.approx(400, rel=0.2)
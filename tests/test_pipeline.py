@@ -0,0 +1,54 @@
+"""
+SentenceSegmenter splitting of streamed LLM deltas (src/pipeline.py).
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from pipeline import SentenceSegmenter  # noqa: E402
+
+
+def segment(text: str, min_chars: int = 12, step: int = 3) -> list:
+    """
+    Feed `text` in deltas of `step` characters, like a token stream, then flush.
+    """
+    segmenter = SentenceSegmenter(min_chars)
+    sentences = []
+    for i in range(0, len(text), step):
+        sentences.extend(segmenter.feed(text[i:i + step]))
+    return sentences + segmenter.flush()
+
+
+def test_sentence_is_returned_once_complete():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("That sounds like a lot") == []
+    assert segmenter.feed(" to carry. What ") == ["That sounds like a lot to carry."]
+    assert segmenter.feed("feels urgent?") == []  # no whitespace after "?" yet
+    assert segmenter.flush() == ["What feels urgent?"]
+    assert segmenter.flush() == []
+
+
+def test_short_sentences_are_merged_with_the_next():
+    assert segment("Ok. That sounds hard. Yes. I see.") == ["Ok. That sounds hard.", "Yes. I see."]
+
+
+def test_newlines_split_sentences():
+    text = "Try this:\n- write one task down\n- start it before lunch\n\nHow does that sound?"
+    assert segment(text) == [
+        "Try this:\n- write one task down",
+        "- start it before lunch",
+        "How does that sound?",
+    ]
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    assert segment('You said "I can\'t do it." Is that true?') == ['You said "I can\'t do it."', "Is that true?"]
+
+
+def test_result_does_not_depend_on_delta_size():
+    text = "First, breathe. Then list three things you did well today! Which one matters most?"
+    expected = segment(text, step=len(text))
+    assert expected == ["First, breathe.", "Then list three things you did well today!", "Which one matters most?"]
+    for step in (1, 2, 5, 7):
+        assert segment(text, step=step) == expected
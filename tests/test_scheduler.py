@@ -0,0 +1,127 @@
+"""
+CoachScheduler admission order, wait prediction and load shedding (src/scheduler.py).
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+import scheduler as scheduler_module  # noqa: E402
+from scheduler import CoachScheduler, SchedulerBusy  # noqa: E402
+
+
+def wait_until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def admit_in_order(scheduler: CoachScheduler, requests, admitted: list) -> list:
+    """
+    Queue `requests` (session, name) one after another behind the busy slot and
+    return their threads; each records its name when admitted and leaves at once.
+    """
+    def worker(session, name):
+        with scheduler.slot(session):
+            admitted.append(name)
+
+    threads = []
+    for session, name in requests:
+        waiting = scheduler.waiting
+        thread = threading.Thread(target=worker, args=(session, name))
+        thread.start()
+        wait_until(lambda: scheduler.waiting == waiting + 1)
+        threads.append(thread)
+    return threads
+
+
+def test_round_robin_across_sessions():
+    scheduler = CoachScheduler(max_concurrent=1, max_wait_s=10.0, initial_service_s=0.01)
+    admitted = []
+    blocker = scheduler.acquire("other")
+    threads = admit_in_order(scheduler, [("A", "A0"), ("A", "A1"), ("A", "A2"), ("B", "B0"), ("B", "B1")], admitted)
+    scheduler.release(blocker)
+    for thread in threads:
+        thread.join()
+    assert admitted == ["A0", "B0", "A1", "B1", "A2"]
+
+
+def test_slot_taken_without_queueing_uses_no_round_robin_turn():
+    # A0 takes the free slot directly; A1 was queued before B0, so it still goes first
+    scheduler = CoachScheduler(max_concurrent=1, max_wait_s=10.0, initial_service_s=0.01)
+    admitted = ["A0"]
+    first = scheduler.acquire("A")
+    threads = admit_in_order(scheduler, [("A", "A1"), ("A", "A2"), ("B", "B0"), ("B", "B1")], admitted)
+    scheduler.release(first)
+    for thread in threads:
+        thread.join()
+    assert admitted == ["A0", "A1", "B0", "A2", "B1"]
+
+
+def test_expected_wait_replays_queue_over_running_slots(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: clock[0])
+    scheduler = CoachScheduler(max_concurrent=2, initial_service_s=4.0)
+    assert scheduler._expected_wait(0) == 0.0
+    scheduler.acquire("A")
+    clock[0] = 101.0
+    scheduler.acquire("B")
+    clock[0] = 102.0
+    # slots free at 104 and 105; each request ahead takes the first one for 4 s
+    assert scheduler._expected_wait(0) == pytest.approx(2.0)
+    assert scheduler._expected_wait(1) == pytest.approx(3.0)
+    assert scheduler._expected_wait(2) == pytest.approx(6.0)
+    # generations past the average are expected to end now
+    clock[0] = 110.0
+    assert scheduler._expected_wait(0) == 0.0
+
+
+def test_shed_when_predicted_wait_exceeds_deadline():
+    scheduler = CoachScheduler(max_concurrent=1, max_wait_s=2.0, initial_service_s=3.0)
+    scheduler.acquire("A")
+    with pytest.raises(SchedulerBusy) as busy:
+        scheduler.acquire("B")
+    assert busy.value.reason == "predicted_wait"
+    assert busy.value.retry_after == pytest.approx(3.0, abs=0.1)
+    assert scheduler.waiting == 0
+
+
+def test_queue_behind_slot_about_to_free_is_not_shed():
+    scheduler = CoachScheduler(max_concurrent=1, max_wait_s=2.0, initial_service_s=3.0)
+    token = scheduler.acquire("A")
+    scheduler._running[token] = time.monotonic() - 2.5  # expected to end in 0.5 s
+    admitted = []
+    threads = admit_in_order(scheduler, [("B", "B0")], admitted)
+    scheduler.release(token)
+    threads[0].join()
+    assert admitted == ["B0"]
+
+
+def test_shed_when_queue_is_full():
+    scheduler = CoachScheduler(max_concurrent=1, max_wait_s=10.0, max_queue=1, initial_service_s=0.01)
+    blocker = scheduler.acquire("A")
+    admitted = []
+    threads = admit_in_order(scheduler, [("B", "B0")], admitted)
+    with pytest.raises(SchedulerBusy) as busy:
+        scheduler.acquire("C")
+    assert busy.value.reason == "queue_full"
+    scheduler.release(blocker)
+    threads[0].join()
+    assert admitted == ["B0"]
+
+
+def test_shed_after_waiting_past_deadline():
+    scheduler = CoachScheduler(max_concurrent=1, max_wait_s=0.2, initial_service_s=0.1)
+    scheduler.acquire("A")  # never released
+    start = time.monotonic()
+    with pytest.raises(SchedulerBusy) as busy:
+        scheduler.acquire("B")
+    assert busy.value.reason == "deadline"
+    assert time.monotonic() - start >= 0.2
+    assert scheduler.waiting == 0
+    assert scheduler.stats()["sessions_waiting"] == 0
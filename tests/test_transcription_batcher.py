@@ -0,0 +1,102 @@
+"""
+TranscriptionBatcher grouping, dispatch deadlines and shutdown (src/transcription_batcher.py).
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+from transcription_batcher import TranscriptionBatcher  # noqa: E402
+
+
+class RecordingSTT:
+    """
+    Stands in for SpeechToText: records every transcribe_many call and "transcribes"
+    a clip as "<language>:<first sample>".
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def transcribe_many(self, clips, language=None, beam_size=1, vad_filter=True):
+        with self.lock:
+            self.calls.append({
+                "ids": [int(c[0]) for c in clips], "language": language, "vad_filter": vad_filter,
+            })
+        return [f"{language}:{int(c[0])}" for c in clips]
+
+
+def clip(n: int):
+    return np.full(160, n, dtype=np.int16)
+
+
+def test_full_batch_is_dispatched_without_waiting():
+    stt = RecordingSTT()
+    batcher = TranscriptionBatcher(stt, max_batch_size=4, max_wait_ms=10_000)
+    start = time.perf_counter()
+    futures = [batcher.submit(clip(i), language="en") for i in range(4)]
+    assert [f.result(timeout=2) for f in futures] == ["en:0", "en:1", "en:2", "en:3"]
+    assert time.perf_counter() - start < 2
+    assert [c["ids"] for c in stt.calls] == [[0, 1, 2, 3]]
+    batcher.close()
+
+
+def test_partial_batch_waits_for_max_wait():
+    stt = RecordingSTT()
+    batcher = TranscriptionBatcher(stt, max_batch_size=8, max_wait_ms=100)
+    start = time.perf_counter()
+    futures = [batcher.submit(clip(i), language="en") for i in range(2)]
+    assert [f.result(timeout=2) for f in futures] == ["en:0", "en:1"]
+    assert time.perf_counter() - start >= 0.1
+    assert [c["ids"] for c in stt.calls] == [[0, 1]]
+    batcher.close()
+
+
+def test_other_groups_are_carried_to_their_own_batch():
+    stt = RecordingSTT()
+    batcher = TranscriptionBatcher(stt, max_batch_size=8, max_wait_ms=100)
+    futures = [
+        batcher.submit(clip(0), language="en"),
+        batcher.submit(clip(1), language="it"),
+        batcher.submit(clip(2), language="en"),
+        batcher.submit(clip(3), language="it"),
+        batcher.submit(clip(4), language="en", vad_filter=False),
+    ]
+    assert [f.result(timeout=2) for f in futures] == ["en:0", "it:1", "en:2", "it:3", "en:4"]
+    batcher.close()
+    calls = {(c["language"], c["vad_filter"]): c["ids"] for c in stt.calls}
+    assert calls == {("en", True): [0, 2], ("it", True): [1, 3], ("en", False): [4]}
+    assert [c["ids"] for c in stt.calls][0] == [0, 2]  # the oldest clip's group goes first
+
+
+def test_close_drains_queued_clips():
+    stt = RecordingSTT()
+    batcher = TranscriptionBatcher(stt, max_batch_size=8, max_wait_ms=10_000)
+    futures = [batcher.submit(clip(i), language="en" if i % 2 else "it") for i in range(5)]
+    start = time.perf_counter()
+    batcher.close()
+    assert time.perf_counter() - start < 2  # does not sit out max_wait_ms
+    assert all(f.done() for f in futures)
+    assert [f.result() for f in futures] == ["it:0", "en:1", "it:2", "en:3", "it:4"]
+    assert sorted(i for c in stt.calls for i in c["ids"]) == [0, 1, 2, 3, 4]
+
+
+class FailingSTT:
+    def transcribe_many(self, clips, **kwargs):
+        raise RuntimeError("CUDA out of memory")
+
+
+def test_model_error_fails_the_whole_batch():
+    batcher = TranscriptionBatcher(FailingSTT(), max_batch_size=2, max_wait_ms=10_000)
+    futures = [batcher.submit(clip(i)) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(timeout=2)
+    batcher.close()